@@ -1,8 +1,135 @@
+import numpy as np
 from abc import ABC, abstractmethod
+from typing import List
+
+from QFA.Cache import PrefixCache
+from QFA.Instrumentation import Collector, now
+from QFA.Kernel import Kernel
+from QFA.WordCorpus import WordCorpus
 
 
 class Automaton(ABC):
 
+    # compiled form of the automaton, built on first use
+    _kernel = None
+    # states of word prefixes used by process, disabled unless enable_prefix_cache is called
+    _prefix_cache = None
+
+    def __setattr__(self, name, value):
+        # the kernel is built from the public attributes, so it is discarded whenever one of them is replaced,
+        # together with the cached states
+        if not name.startswith('_'):
+            self.invalidate()
+        super().__setattr__(name, value)
+
+    def invalidate(self):
+        # discards the kernel and the cached states, needed after matrices are modified in place
+        super().__setattr__('_kernel', None)
+        if self._prefix_cache is not None:
+            self._prefix_cache.clear()
+
+    def enable_prefix_cache(self, maxsize: int = 1024, stride: int = 16):
+        # process resumes every word from the state of its longest cached prefix, see QFA.Cache.PrefixCache
+        # for measure-many automata the accumulated probabilities are cached with the state
+        self._prefix_cache = PrefixCache(maxsize, stride)
+
+    def disable_prefix_cache(self):
+        self._prefix_cache = None
+
+    def cache_info(self) -> dict:
+        # hits, misses, maxsize and currsize of the prefix cache, None if it is disabled
+        return self._prefix_cache.info() if self._prefix_cache is not None else None
+
     @abstractmethod
-    def process(self, word: str) -> (float, float):
+    def build_kernel(self) -> Kernel:
         pass
+
+    def compile(self) -> Kernel:
+        # matrices modified in place are not noticed, assign the attribute again to recompile
+        if self._kernel is None:
+            self._kernel = self.build_kernel()
+        return self._kernel
+
+    # collector - if given, the phases of the evaluation are recorded in it, see QFA.Instrumentation
+
+    def process(self, word: str, rle: bool = False, collector: Collector = None) -> (float, float):
+        # rle - apply runs of repeated letters (a^1000) as cached matrix powers, useful for very repetitive words,
+        #       the prefix cache is not used then
+        if self._prefix_cache is not None and not rle:
+            return self.process_cached(word, collector)
+        kernel = self.compile()
+        run = kernel.run_rle if rle else kernel.run
+        if collector is None:
+            return run(kernel.encode(word))
+
+        probe = collector.probe(type(self).__name__)
+        start = now()
+        codes = kernel.encode(word)
+        probe.record('encode', now() - start, words=1, letters=len(codes))
+        return run(codes, probe)
+
+    def process_cached(self, word: str, collector: Collector = None) -> (float, float):
+        # the state of the longest cached prefix advanced by the rest of the word, the states after the whole word
+        # and after every multiple of the cache stride letters are cached
+        kernel = self.compile()
+        cache = self._prefix_cache
+        if collector is not None:
+            probe = collector.probe(type(self).__name__)
+            start = now()
+        length, state = cache.longest_prefix(word)
+        if state is None:
+            state = kernel.start()
+        codes = kernel.encode(word[length:])
+        if collector is not None:
+            transitions_start = now()
+            # only the letters after the cached prefix are counted
+            probe.record('encode', transitions_start - start, words=1, letters=len(codes))
+
+        for position, symbol in enumerate(codes.tolist(), length + 1):
+            state = kernel.step(state, symbol)
+            if position % cache.stride == 0 or position == len(word):
+                cache.put(word[:position], state)
+
+        if collector is None:
+            return kernel.bounded(kernel.finish(state), len(word))
+        return kernel.bounded(kernel.record_finish(probe, transitions_start, state, len(codes)), len(word))
+
+    # process(word) is equivalent to finish(step(...step(start(), word[0])..., word[-1]))
+    # the state is opaque, it is only passed between these three methods
+
+    def start(self):
+        return self.compile().start()
+
+    def step(self, state, letter: str):
+        kernel = self.compile()
+        return kernel.step(state, kernel.symbol(letter))
+
+    def finish(self, state) -> (float, float):
+        return self.compile().finish(state)
+
+    def process_many(self, words: List[str], collector: Collector = None) -> (np.ndarray, np.ndarray):
+        # evaluates all words together and returns arrays of acceptance probabilities and errors
+        # words - list of strings or a WordCorpus, whose symbols are used without creating strings
+        kernel = self.compile()
+        probe = None
+        if collector is not None:
+            probe = collector.probe(type(self).__name__)
+            start = now()
+
+        if isinstance(words, WordCorpus):
+            codes, offsets = words.encoded()
+            codes = kernel.recode(words.alphabet, codes)
+        else:
+            codes, offsets = kernel.encode_many(words)
+
+        if probe is not None:
+            probe.record('encode', now() - start, words=len(offsets) - 1, letters=len(codes))
+        return kernel.run_many(codes, offsets, probe)
+
+    def process_trie(self, words: List[str], collector: Collector = None) -> (np.ndarray, np.ndarray):
+        # same results as process_many, but every distinct prefix of the words is processed only once
+        # the letters counted by a collector are only those of the distinct prefixes
+        if isinstance(words, WordCorpus):
+            words = words.words()
+        probe = collector.probe(type(self).__name__) if collector is not None else None
+        return self.compile().run_trie(words, probe)
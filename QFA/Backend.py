@@ -0,0 +1,59 @@
+import numpy as np
+import scipy.sparse as sp
+
+# matrices are kept as np.ndarray
+DENSE = 'dense'
+# matrices are kept as scipy.sparse CSR matrices, memory and matrix-vector products are O(nnz) instead of O(n^2)
+SPARSE = 'sparse'
+
+
+def is_sparse(matrix) -> bool:
+    return sp.issparse(matrix)
+
+
+def is_real(matrix) -> bool:
+    # True if no entry has a nonzero imaginary part, complex matrices with real entries are real as well
+    data = matrix.data if is_sparse(matrix) else np.asarray(matrix)
+    return not np.iscomplexobj(data) or not np.any(data.imag)
+
+
+def detect_backend(matrices) -> str:
+    return SPARSE if any(is_sparse(m) for m in matrices) else DENSE
+
+
+def to_backend(matrix, backend: str = None):
+    # backend None keeps the matrix as it is
+    if backend is None:
+        return matrix
+    elif backend == DENSE:
+        return to_dense(matrix)
+    elif backend == SPARSE:
+        return sp.csr_matrix(matrix)
+    else:
+        raise Exception('Unknown backend: ' + str(backend))
+
+
+def to_dense(matrix) -> np.ndarray:
+    if is_sparse(matrix):
+        return matrix.toarray()
+    return np.asarray(matrix)
+
+
+def identity(size: int, backend: str = DENSE):
+    if backend == SPARSE:
+        return sp.identity(size, format='csr')
+    return np.eye(size)
+
+
+def equals_identity(matrix) -> bool:
+    # exact comparison, as np.array_equal
+    if is_sparse(matrix):
+        size = matrix.shape[0]
+        return matrix.shape == (size, size) and (matrix != identity(size, SPARSE)).nnz == 0
+    return np.array_equal(matrix, np.eye(matrix.shape[0]))
+
+
+def vstack(matrices):
+    if any(is_sparse(m) for m in matrices):
+        return sp.vstack(matrices, format='csr')
+    return np.vstack(matrices)
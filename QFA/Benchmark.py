@@ -0,0 +1,201 @@
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from typing import Callable, List
+
+from QFA.Automaton import Automaton
+from QFA.GQFA import GQFA
+from QFA.Kernel import DOUBLE, DTYPES
+from QFA.LanguageChecker import LanguageChecker
+from QFA.LanguageGenerator import LanguageGenerator
+from QFA.MM_1QFA import MM_1QFA
+from QFA.MO_1QFA import MO_1QFA
+from QFA.PFA import PFA
+from QFA.WordCorpus import WordCorpus
+
+# Throughput and memory benchmarks, run with:
+#   python -m QFA.Benchmark [--quick] [--output results.json]
+# Every measurement is one JSON object in the "results" list, so runs can be compared by their parameters.
+
+AUTOMATA = ['PFA', 'MO_1QFA', 'MM_1QFA', 'GQFA']
+# how the words are evaluated: process_many on strings, process_many on a WordCorpus, process_trie
+# the trie is slow on random words, which share only short prefixes, so it is measured only on request
+MODES = ['batch', 'corpus', 'trie']
+DEFAULT_MODES = ['batch', 'corpus']
+# precisions of the kernel, see QFA.Kernel
+PRECISIONS = list(DTYPES)
+
+FULL = {'states': [4, 16, 64], 'alphabet_sizes': [2, 4], 'word_lengths': [10, 100], 'corpus_sizes': [1000, 10000],
+        'generator_sizes': [10000, 100000], 'checker_sizes': [10000]}
+QUICK = {'states': [4], 'alphabet_sizes': [2], 'word_lengths': [10], 'corpus_sizes': [100],
+         'generator_sizes': [100], 'checker_sizes': [100]}
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def random_unitary(n: int, rng: np.random.Generator) -> np.ndarray:
+    # Q of the QR decomposition of a complex gaussian matrix, with phases making it Haar distributed
+    q, r = np.linalg.qr(rng.standard_normal((n, n)) + 1j * rng.standard_normal((n, n)))
+    diagonal = np.diag(r)
+    return q * (diagonal / np.abs(diagonal))
+
+
+def random_stochastic(n: int, rng: np.random.Generator) -> np.ndarray:
+    # rows sum to 1
+    m = rng.random((n, n))
+    return m / m.sum(axis=1, keepdims=True)
+
+
+def random_projections(n: int, rng: np.random.Generator) -> (np.ndarray, np.ndarray):
+    # accepting and rejecting projections on disjoint random sets of basis states, a quarter of them each
+    states = rng.permutation(n)
+    accepting = np.zeros((n, n))
+    rejecting = np.zeros((n, n))
+    accepting[states[:max(1, n // 4)], states[:max(1, n // 4)]] = 1
+    rejecting[states[n // 4:n // 2], states[n // 4:n // 2]] = 1
+    return accepting, rejecting
+
+
+def random_automaton(kind: str, states: int, alphabet_size: int, rng: np.random.Generator) -> Automaton:
+    alphabet = ALPHABET[:alphabet_size]
+    if kind == 'PFA':
+        initial_state = np.zeros((1, states))
+        initial_state[0, 0] = 1
+        acceptance_vector = np.zeros((states, 1))
+        acceptance_vector[:states // 2 + 1] = 1
+        return PFA(alphabet, initial_state, [random_stochastic(states, rng) for _ in alphabet], acceptance_vector)
+
+    initial_state = np.zeros((states, 1))
+    initial_state[0] = 1
+    if kind == 'MO_1QFA':
+        projective_measurement = np.diag((np.arange(states) < states // 2 + 1).astype(float))
+        return MO_1QFA(alphabet, initial_state, [random_unitary(states, rng) for _ in alphabet], projective_measurement)
+
+    # measure-many automata read the end symbol as well
+    transition_matrices = [random_unitary(states, rng) for _ in range(alphabet_size + 1)]
+    if kind == 'MM_1QFA':
+        accepting, rejecting = random_projections(states, rng)
+        return MM_1QFA(alphabet, initial_state, transition_matrices, accepting, rejecting)
+    elif kind == 'GQFA':
+        measurements = [list(random_projections(states, rng)) for _ in range(alphabet_size + 1)]
+        return GQFA(alphabet, initial_state, transition_matrices, measurements)
+    raise Exception('Unknown automaton: ' + kind)
+
+
+def random_corpus(alphabet: str, count: int, length: int, rng: np.random.Generator) -> WordCorpus:
+    # count words of the given length
+    offsets = np.arange(count + 1, dtype=np.intp) * length
+    symbols = rng.integers(0, len(alphabet), count * length, dtype=np.uint8)
+    return WordCorpus(alphabet, symbols, offsets)
+
+
+def measure(function: Callable, repeat: int) -> dict:
+    # the best time of several runs, and the peak of memory allocated during one more run traced by tracemalloc
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_memory_bytes': peak}
+
+
+def benchmark_automata(grid: dict, repeat: int, seed: int, automata: List[str] = AUTOMATA,
+                       modes: List[str] = DEFAULT_MODES, precisions: List[str] = (DOUBLE,)) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    results = []
+    for kind, states, alphabet_size in itertools.product(automata, grid['states'], grid['alphabet_sizes']):
+        automaton = random_automaton(kind, states, alphabet_size, rng)
+        for precision, length, count in itertools.product(precisions, grid['word_lengths'], grid['corpus_sizes']):
+            automaton.precision = precision
+            automaton.compile()
+            corpus = random_corpus(automaton.alphabet, count, length, rng)
+            words = corpus.words()
+            functions = {'batch': lambda: automaton.process_many(words),
+                         'corpus': lambda: automaton.process_many(corpus),
+                         'trie': lambda: automaton.process_trie(words)}
+            for mode in modes:
+                result = {'benchmark': 'automaton', 'automaton': kind, 'mode': mode, 'precision': precision,
+                          'states': states, 'alphabet_size': alphabet_size, 'word_length': length, 'words': count}
+                result.update(measure(functions[mode], repeat))
+                result['words_per_second'] = count / result['seconds']
+                results.append(result)
+    return results
+
+
+def benchmark_generator(grid: dict, repeat: int, seed: int) -> List[dict]:
+    generator = LanguageGenerator('(a|bc)*d?', 'abcd')
+    methods = {'get_language_sample': lambda n: generator.get_language_sample(n, max_len=30),
+               'get_random_sample': lambda n: generator.get_random_sample(n, max_len=30, seed=seed),
+               'get_uniform_sample': lambda n: generator.get_uniform_sample(n, max_len=30)}
+    results = []
+    for method, count in itertools.product(methods, grid['generator_sizes']):
+        result = {'benchmark': 'generator', 'method': method, 'words': count}
+        result.update(measure(lambda: methods[method](count), repeat))
+        result['words_per_second'] = count / result['seconds']
+        results.append(result)
+    return results
+
+
+def benchmark_checker(grid: dict, repeat: int, seed: int, automata: List[str] = AUTOMATA) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    generator = LanguageGenerator('(a|bc)*d?', 'abcd')
+    results = []
+    for kind, count in itertools.product(automata, grid['checker_sizes']):
+        automaton = random_automaton(kind, 16, 4, rng)
+        language, not_in_language = generator.get_random_sample(count, max_len=30, seed=seed)
+
+        def check():
+            LanguageChecker(automaton, language, not_in_language).check_language()
+
+        result = {'benchmark': 'checker', 'automaton': kind, 'states': 16, 'alphabet_size': 4, 'words': count}
+        result.update(measure(check, repeat))
+        result['words_per_second'] = count / result['seconds']
+        results.append(result)
+    return results
+
+
+def run(quick: bool = False, repeat: int = 3, seed: int = 0, automata: List[str] = AUTOMATA,
+        modes: List[str] = DEFAULT_MODES, precisions: List[str] = (DOUBLE,)) -> dict:
+    grid = QUICK if quick else FULL
+    return {'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                            'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                            'quick': quick, 'repeat': repeat, 'seed': seed},
+            'results': benchmark_automata(grid, repeat, seed, automata, modes, precisions) +
+            benchmark_generator(grid, repeat, seed) + benchmark_checker(grid, repeat, seed, automata)}
+
+
+def main(arguments: List[str] = None):
+    parser = argparse.ArgumentParser(description='Measures evaluation throughput and peak memory of the automata.')
+    parser.add_argument('--quick', action='store_true', help='small sizes only, to check that everything runs')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every measurement, the best is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--automata', nargs='+', choices=AUTOMATA, default=AUTOMATA)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=DEFAULT_MODES)
+    parser.add_argument('--precisions', nargs='+', choices=PRECISIONS, default=[DOUBLE])
+    parser.add_argument('--output', help='JSON file for the results, printed if not given')
+    arguments = parser.parse_args(arguments)
+
+    report = run(arguments.quick, arguments.repeat, arguments.seed, arguments.automata, arguments.modes,
+                 arguments.precisions)
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
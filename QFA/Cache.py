@@ -0,0 +1,86 @@
+from collections import Counter, OrderedDict
+
+
+class LRUCache:
+    # bounded mapping which evicts the least recently used entry when it is full
+
+    def __init__(self, maxsize: int = 128):
+        if maxsize < 1:
+            raise Exception('Cache size must be positive')
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        # returns the evicted (key, value) pair, None if no entry was evicted
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            return self.entries.popitem(last=False)
+        return None
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PrefixCache:
+    # states of word prefixes, a word resumes from the state of its longest cached prefix, see Automaton.process
+    # the states of whole words and of their prefixes of every multiple of stride letters are kept,
+    # so a word diverging from a cached word in the middle reads at most stride - 1 of the shared letters again
+
+    def __init__(self, maxsize: int = 1024, stride: int = 16):
+        if stride < 1:
+            raise Exception('Cache stride must be positive')
+        self.entries = LRUCache(maxsize)
+        self.stride = stride
+        # number of cached prefixes of every length, only these lengths are looked up
+        self.lengths = Counter()
+        # words which resumed from a cached prefix and words which did not
+        self.hits = 0
+        self.misses = 0
+
+    def longest_prefix(self, word: str):
+        # (length, state) of the longest cached prefix of the word, (0, None) if there is none
+        for length in sorted((length for length in self.lengths if length <= len(word)), reverse=True):
+            prefix = word[:length]
+            if prefix in self.entries:
+                self.hits += 1
+                return length, self.entries.get(prefix)
+        self.misses += 1
+        return 0, None
+
+    def put(self, prefix: str, state):
+        if prefix not in self.entries:
+            self.lengths[len(prefix)] += 1
+        evicted = self.entries.put(prefix, state)
+        if evicted is not None:
+            self.lengths[len(evicted[0])] -= 1
+            if not self.lengths[len(evicted[0])]:
+                del self.lengths[len(evicted[0])]
+
+    def clear(self):
+        self.entries.clear()
+        self.lengths.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'maxsize': self.entries.maxsize,
+                'currsize': len(self.entries)}
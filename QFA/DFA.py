@@ -0,0 +1,282 @@
+import re
+import random
+import numpy as np
+from typing import List
+
+
+class DFA:
+    # complete deterministic automaton over the letters of an alphabet, symbols are positions of letters in it
+
+    def __init__(self,
+                 alphabet: str,
+                 transitions: np.ndarray,
+                 accepting: np.ndarray,
+                 start: int = 0):
+        self.alphabet = alphabet
+        # transitions[state][symbol] - next state
+        self.transitions = transitions
+        # accepting[state] - True if the state is accepting
+        self.accepting = accepting
+        self.start = start
+
+    def accepts(self, word: str) -> bool:
+        state = self.start
+        for letter in word:
+            state = self.transitions[state][self.alphabet.index(letter)]
+        return bool(self.accepting[state])
+
+    def accepts_many(self, codes: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        # words encoded as in Kernel.encode_many, all of them are advanced together one position at a time,
+        # sorted by decreasing length, so the words still being read always form a prefix
+        lengths = np.diff(offsets)
+        order = np.argsort(-lengths, kind='stable')
+        negative_lengths = -lengths[order]
+        starts = offsets[:-1][order]
+
+        states = np.full(len(lengths), self.start, dtype=np.intp)
+        steps = -negative_lengths[0] if len(lengths) else 0
+        for position in range(steps):
+            reading = np.searchsorted(negative_lengths, -position, side='left')
+            states[:reading] = self.transitions[states[:reading], codes[starts[:reading] + position]]
+
+        accepted = np.empty(len(lengths), dtype=bool)
+        accepted[order] = self.accepting[states]
+        return accepted
+
+    def complement(self) -> 'DFA':
+        return DFA(self.alphabet, self.transitions, ~self.accepting, self.start)
+
+    def count_words(self, max_len: int) -> List[np.ndarray]:
+        # counts[length][state] - number of words of the given length leading from the state to an accepting state
+        # python integers are used, the counts grow as |alphabet|^length
+        counts = [np.array([int(a) for a in self.accepting], dtype=object)]
+        for _ in range(max_len):
+            counts.append(counts[-1][self.transitions].sum(axis=1))
+        return counts
+
+    def sample(self, length: int, counts: List[np.ndarray], rng: random.Random = random) -> str:
+        # a word of the given length drawn uniformly from the accepted words of that length
+        # counts - result of count_words(max_len) with max_len >= length
+        state = self.start
+        if counts[length][state] == 0:
+            raise Exception('No accepted words of length ' + str(length))
+        letters = []
+        for remaining in range(length, 0, -1):
+            # next letter chosen with probability proportional to the number of accepted words continuing with it
+            x = rng.randrange(counts[remaining][state])
+            for symbol, next_state in enumerate(self.transitions[state]):
+                x -= counts[remaining - 1][next_state]
+                if x < 0:
+                    break
+            letters.append(self.alphabet[symbol])
+            state = next_state
+        return ''.join(letters)
+
+    def all_words(self, length: int, counts: List[np.ndarray]) -> List[str]:
+        # all accepted words of the given length, only prefixes which can still be accepted are extended
+        words = []
+        stack = [('', self.start)]
+        while stack:
+            prefix, state = stack.pop()
+            remaining = length - len(prefix)
+            if remaining == 0:
+                words.append(prefix)
+                continue
+            for symbol, next_state in enumerate(self.transitions[state]):
+                if counts[remaining - 1][next_state]:
+                    stack.append((prefix + self.alphabet[symbol], next_state))
+        return words
+
+
+def regex_to_dfa(regex: str, alphabet: str) -> DFA:
+    # supports the regular subset of python's re syntax: letters, '.', classes ([...], \d, ...), groups,
+    # alternation and the quantifiers *, +, ?, {m}, {m,}, {,n}, {m,n}; the DFA matches like re.fullmatch
+    tree = RegexParser(regex, alphabet).parse()
+    nfa = NFA(len(alphabet))
+    start, end = nfa.build(tree)
+    return nfa.determinize(alphabet, start, end)
+
+
+class RegexParser:
+    # recursive descent parser producing a syntax tree:
+    # ('set', symbols), ('cat', [trees]), ('alt', [trees]), ('repeat', tree, min, max or None)
+
+    def __init__(self, regex: str, alphabet: str):
+        self.regex = regex
+        self.alphabet = alphabet
+        self.position = 0
+
+    def parse(self):
+        tree = self.alternation()
+        if self.position != len(self.regex):
+            raise Exception('Unbalanced parenthesis at position ' + str(self.position) + ' in ' + self.regex)
+        return tree
+
+    def peek(self):
+        return self.regex[self.position] if self.position < len(self.regex) else None
+
+    def alternation(self):
+        branches = [self.concatenation()]
+        while self.peek() == '|':
+            self.position += 1
+            branches.append(self.concatenation())
+        return branches[0] if len(branches) == 1 else ('alt', branches)
+
+    def concatenation(self):
+        items = []
+        while self.peek() is not None and self.peek() not in '|)':
+            items.append(self.quantified())
+        return ('cat', items)
+
+    def quantified(self):
+        tree = self.atom()
+        while True:
+            c = self.peek()
+            if c == '*':
+                tree = ('repeat', tree, 0, None)
+            elif c == '+':
+                tree = ('repeat', tree, 1, None)
+            elif c == '?':
+                tree = ('repeat', tree, 0, 1)
+            elif c == '{' and self.repetition_bounds() is not None:
+                bounds, length = self.repetition_bounds()
+                tree = ('repeat', tree) + bounds
+                self.position += length - 1
+            else:
+                return tree
+            self.position += 1
+            # lazy and possessive quantifiers match the same words
+            if self.peek() in ('?', '+') and tree[0] == 'repeat':
+                self.position += 1
+
+    def repetition_bounds(self):
+        # ((min, max), length of the quantifier) or None if '{' is a literal, as in re
+        match = re.match(r'\{(\d*)(,?)(\d*)\}', self.regex[self.position:])
+        if match is None or (not match.group(2) and not match.group(1)):
+            return None
+        minimum = int(match.group(1)) if match.group(1) else 0
+        if match.group(2):
+            maximum = int(match.group(3)) if match.group(3) else None
+        else:
+            maximum = minimum
+        return (minimum, maximum), len(match.group(0))
+
+    def atom(self):
+        c = self.peek()
+        if c == '(':
+            self.position += 1
+            if self.regex.startswith('?:', self.position):
+                self.position += 2
+            elif self.peek() == '?':
+                raise Exception('Unsupported group in ' + self.regex)
+            tree = self.alternation()
+            if self.peek() != ')':
+                raise Exception('Missing ) in ' + self.regex)
+            self.position += 1
+            return tree
+        if c in '*+?':
+            raise Exception('Nothing to repeat at position ' + str(self.position) + ' in ' + self.regex)
+        if c in '^$':
+            raise Exception('Anchors are not supported in ' + self.regex)
+
+        # a single letter pattern: its letters are found by matching every letter of the alphabet with re
+        start = self.position
+        if c == '[':
+            self.position += 1
+            if self.peek() == '^':
+                self.position += 1
+            if self.peek() == ']':
+                self.position += 1
+            while self.peek() is not None and self.peek() != ']':
+                self.position += 2 if self.peek() == '\\' else 1
+            if self.peek() is None:
+                raise Exception('Unterminated character set in ' + self.regex)
+        elif c == '\\':
+            self.position += 1
+            if self.peek() is None or self.peek().isdigit() or self.peek() in 'bBAZ':
+                raise Exception('Unsupported escape in ' + self.regex)
+        self.position += 1
+        pattern = re.compile(self.regex[start:self.position])
+        return 'set', frozenset(i for i, letter in enumerate(self.alphabet) if pattern.fullmatch(letter))
+
+
+class NFA:
+    # Thompson's construction, a state has labelled and epsilon transitions
+
+    def __init__(self, symbols: int):
+        self.symbols = symbols
+        self.labelled = []
+        self.epsilon = []
+
+    def state(self) -> int:
+        self.labelled.append([])
+        self.epsilon.append([])
+        return len(self.labelled) - 1
+
+    def build(self, tree) -> (int, int):
+        # returns (start, end) of a fresh fragment recognising the tree
+        start, end = self.state(), self.state()
+        kind = tree[0]
+        if kind == 'set':
+            for symbol in tree[1]:
+                self.labelled[start].append((symbol, end))
+        elif kind == 'cat':
+            current = start
+            for item in tree[1]:
+                item_start, item_end = self.build(item)
+                self.epsilon[current].append(item_start)
+                current = item_end
+            self.epsilon[current].append(end)
+        elif kind == 'alt':
+            for branch in tree[1]:
+                branch_start, branch_end = self.build(branch)
+                self.epsilon[start].append(branch_start)
+                self.epsilon[branch_end].append(end)
+        else:
+            _, item, minimum, maximum = tree
+            current = start
+            for _ in range(minimum):
+                item_start, item_end = self.build(item)
+                self.epsilon[current].append(item_start)
+                current = item_end
+            if maximum is None:
+                item_start, item_end = self.build(item)
+                self.epsilon[current].append(item_start)
+                self.epsilon[item_end].append(current)
+            else:
+                for _ in range(maximum - minimum):
+                    item_start, item_end = self.build(item)
+                    self.epsilon[current].append(item_start)
+                    self.epsilon[current].append(end)
+                    current = item_end
+            self.epsilon[current].append(end)
+        return start, end
+
+    def closure(self, states) -> frozenset:
+        closed = set(states)
+        stack = list(states)
+        while stack:
+            for next_state in self.epsilon[stack.pop()]:
+                if next_state not in closed:
+                    closed.add(next_state)
+                    stack.append(next_state)
+        return frozenset(closed)
+
+    def determinize(self, alphabet: str, start: int, end: int) -> DFA:
+        # subset construction, the empty set becomes the dead state, so the DFA is complete
+        initial = self.closure([start])
+        subsets = {initial: 0}
+        queue = [initial]
+        transitions = []
+        while len(transitions) < len(queue):
+            subset = queue[len(transitions)]
+            row = []
+            for symbol in range(self.symbols):
+                target = self.closure([t for s in subset for (a, t) in self.labelled[s] if a == symbol])
+                if target not in subsets:
+                    subsets[target] = len(queue)
+                    queue.append(target)
+                row.append(subsets[target])
+            transitions.append(row)
+        accepting = np.array([end in subset for subset in queue], dtype=bool)
+        return DFA(alphabet, np.array(transitions, dtype=np.intp).reshape(len(queue), self.symbols), accepting)
@@ -0,0 +1,125 @@
+import numpy as np
+from collections import deque
+from typing import Dict, List, Tuple
+
+from QFA.Automaton import Automaton
+from QFA.Backend import to_dense
+from QFA.Kernel import MEASURE_MANY, MEASURE_ONCE
+
+# Exact equivalence of automata: two automata are equivalent if they accept every word with the same probability.
+# Every automaton is brought to a linear representation (initial, operators, final) with
+#   process(w)[0] == final @ operators[w[-1]] @ ... @ operators[w[0]] @ initial
+# and the representations of both automata are compared on a basis of the states they can reach (Tzeng's algorithm),
+# which takes O(N^3 * |alphabet|) time for N the sum of the dimensions of the representations.
+
+# default tolerance of the comparisons, relative to the norm of the compared vectors
+TOLERANCE = 1e-9
+
+
+def linear_representation(automaton: Automaton) -> (np.ndarray, Dict[str, np.ndarray], np.ndarray):
+    # (initial, {letter: operator}, final) of the automaton
+    # PFA - the transposed matrices of the kernel, of dimension n
+    # MO_1QFA - the state v is replaced by v (x) conj(v) and the measurement by a linear functional, dimension n^2
+    # MM_1QFA and GQFA - as MO_1QFA with one more coordinate accumulating the acceptance probability,
+    #   dimension n^2 + 1
+    kernel = automaton.compile()
+    letters = {kernel.alphabet[symbol]: symbol for symbol in kernel.letter_symbols()}
+    operators = [to_dense(operator) for operator in kernel.operators]
+    initial = kernel.initial_state
+
+    if kernel.kind == MEASURE_ONCE:
+        final = to_dense(kernel.final)
+        return (np.kron(initial, initial.conj()), {letter: np.kron(operators[symbol], operators[symbol].conj())
+                                                   for letter, symbol in letters.items()},
+                measurement_functional(final))
+    elif kernel.kind == MEASURE_MANY:
+        n = kernel.size
+        representation = {}
+        for letter, symbol in letters.items():
+            operator = np.zeros((n * n + 1, n * n + 1), dtype=kernel.dtype)
+            non_halting = operators[symbol][:n]
+            operator[:n * n, :n * n] = np.kron(non_halting, non_halting.conj())
+            # the probability of accepting after the letter is added to the last coordinate
+            operator[n * n, :n * n] = measurement_functional(operators[symbol][n:2 * n])
+            operator[n * n, n * n] = 1
+            representation[letter] = operator
+        final = np.append(measurement_functional(operators[kernel.end_symbol][n:2 * n]), 1)
+        return np.append(np.kron(initial, initial.conj()), 0), representation, final
+    else:
+        return initial, {letter: operators[symbol] for letter, symbol in letters.items()}, np.asarray(kernel.final)
+
+
+def measurement_functional(measurement: np.ndarray) -> np.ndarray:
+    # g such that g @ (v (x) conj(v)) == |measurement @ v|^2 for every vector v
+    gram = measurement.conj().T @ measurement
+    return gram.T.ravel()
+
+
+def span(vector: np.ndarray, operators: List[np.ndarray], tolerance: float = TOLERANCE) \
+        -> (np.ndarray, List[Tuple[int, ...]], List[np.ndarray]):
+    # the smallest subspace containing the vector and closed under the operators, found breadth-first
+    # vector - a vector, or a matrix whose columns all start the search with the empty word
+    # returns (basis, words, vectors): the orthonormal basis as columns, and for every basis vector the word
+    # (indices of operators) and the vector operators[word[-1]] @ ... @ operators[word[0]] @ vector it comes from
+    # a vector is new if the part of it orthogonal to the basis is longer than tolerance times its norm
+    basis = []
+    words = []
+    vectors = []
+    dimension = vector.shape[0]
+    dtype = vector.dtype
+    queue = deque(((), column) for column in (vector.T if vector.ndim == 2 else [vector]))
+    while queue:
+        word, vector = queue.popleft()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            continue
+        residual = vector
+        # Gram-Schmidt done twice keeps the basis orthogonal to working precision
+        for _ in range(2):
+            for b in basis:
+                residual = residual - np.vdot(b, residual) * b
+        residual_norm = np.linalg.norm(residual)
+        if residual_norm <= tolerance * norm:
+            continue
+        basis.append(residual / residual_norm)
+        words.append(word)
+        vectors.append(vector)
+        for i, operator in enumerate(operators):
+            queue.append((word + (i,), operator @ vector))
+
+    basis = np.column_stack(basis) if basis else np.zeros((dimension, 0), dtype=dtype)
+    return basis, words, vectors
+
+
+def distinguishing_word(first: Automaton, second: Automaton, tolerance: float = TOLERANCE):
+    # a word accepted by the automata with different probabilities, None if they are equivalent
+    # the word found is the shortest one among the words of the basis, at most as long as the dimension of
+    # the two representations together
+    first_initial, first_operators, first_final = linear_representation(first)
+    second_initial, second_operators, second_final = linear_representation(second)
+    if set(first_operators) != set(second_operators):
+        raise Exception('The automata have different alphabets')
+
+    # both automata run side by side, final gives the difference of their acceptance probabilities
+    letters = list(first_operators)
+    size = len(first_initial)
+    dtype = np.result_type(first_initial, second_initial, *first_operators.values(), *second_operators.values())
+    operators = []
+    for letter in letters:
+        operator = np.zeros((size + len(second_initial), size + len(second_initial)), dtype=dtype)
+        operator[:size, :size] = first_operators[letter]
+        operator[size:, size:] = second_operators[letter]
+        operators.append(operator)
+    initial = np.concatenate([first_initial, second_initial]).astype(dtype)
+    final = np.concatenate([first_final, -second_final])
+
+    # the difference is 0 for every word if and only if it is 0 on the vectors of the basis
+    _, words, vectors = span(initial, operators, tolerance)
+    for word, vector in zip(words, vectors):
+        if abs(final @ vector) > tolerance * max(1.0, np.linalg.norm(vector)):
+            return ''.join(letters[i] for i in word)
+    return None
+
+
+def equivalent(first: Automaton, second: Automaton, tolerance: float = TOLERANCE) -> bool:
+    return distinguishing_word(first, second, tolerance) is None
@@ -1,15 +1,16 @@
 import numpy as np
+import scipy.sparse as sp
 from typing import List
 from math import sqrt
 
 from QFA.Automaton import Automaton
-
-State = (np.ndarray, float, float)
+from QFA.Backend import detect_backend, equals_identity, identity, is_sparse, to_backend, vstack
+from QFA.Kernel import DOUBLE, Kernel, MEASURE_MANY
 
 
 def get_complementary_matrix(list_of_matrices: List[np.ndarray]) -> np.ndarray:
     size = list_of_matrices[0].shape[0]
-    diag = np.eye(size)
+    diag = identity(size, detect_backend(list_of_matrices))
     s = sum(list_of_matrices)
     return diag - s
 
@@ -21,7 +22,7 @@ def get_projective_measurements(list_of_matrices: List[List[np.ndarray]]) -> Lis
         for i, measurement in enumerate(list_of_matrices):
             size = measurement[0].shape[0]
             s = sum(measurement)
-            if not np.array_equal(s, np.eye(size)):
+            if not equals_identity(s):
                 print(s, np.eye(size))
                 raise Exception('Wrong ', i, 'th measurement')
         return list_of_matrices
@@ -31,7 +32,12 @@ def get_projective_measurements(list_of_matrices: List[List[np.ndarray]]) -> Lis
 
 
 def is_unitary(m: np.ndarray) -> bool:
-    return np.allclose(np.eye(m.shape[0]), np.conjugate(m).T @ m)
+    product = m.conj().T @ m
+    if is_sparse(product):
+        # same tolerances as np.allclose, without building the dense product
+        diagonal = product.diagonal()
+        return np.allclose(diagonal, 1) and np.allclose((product - sp.diags(diagonal, dtype=product.dtype)).data, 0)
+    return np.allclose(np.eye(m.shape[0]), product)
 
 
 def check_transition_matrices(matrices: List[np.ndarray]) -> List[np.ndarray]:
@@ -41,13 +47,23 @@ def check_transition_matrices(matrices: List[np.ndarray]) -> List[np.ndarray]:
         raise Exception('Transition matrix is not unitary')
 
 
+def fuse_measurement(transition_matrix: np.ndarray, projective_measurements: List[np.ndarray]) -> np.ndarray:
+    # operator of a measure-many kernel: the non halting, accepting and rejecting parts of the new state stacked
+    projective_measurement_accept, projective_measurement_reject, projective_measurement_non = projective_measurements
+    return vstack([projective_measurement_non @ transition_matrix,
+                   projective_measurement_accept @ transition_matrix,
+                   projective_measurement_reject @ transition_matrix])
+
+
 class GQFA(Automaton):
 
     def __init__(self,
                  alphabet: str,
                  initial_state: np.ndarray,
                  transition_matrices: List[np.ndarray],
-                 projective_measurements: List[List[np.ndarray]]
+                 projective_measurements: List[List[np.ndarray]],
+                 backend: str = None,
+                 precision: str = DOUBLE
                  ):
         # list of chars
         self.alphabet = alphabet
@@ -56,53 +72,24 @@ class GQFA(Automaton):
         # list of np matrices - position in list corresponds to position of letter in alphabet,
         # perhaps a map could be better
         # watch out in GQFA - there needs to be a transition matrix for the end symbol
-        self.transition_matrices = check_transition_matrices(transition_matrices)
+        # backend - 'dense' or 'sparse' converts all matrices, by default they are kept as they are
+        self.transition_matrices = check_transition_matrices([to_backend(m, backend) for m in transition_matrices])
         # list of lists of 2 np matrices containing ones and zeroes
         # first one should be accepting
         # second one should be rejecting
         # similarly as the list of transition matrices
-        self.projective_measurements = get_projective_measurements(projective_measurements)
-
-    def process(self, word: str) -> (float, float):
-
-        total_state = (self.initial_state, 0, 0)
-
-        for letter in word:
-            transition_matrix = self.transition_matrices[self.alphabet.index(letter)]
-            projective_measurements = self.projective_measurements[self.alphabet.index(letter)]
-
-            total_state = self.process_word(total_state, transition_matrix, projective_measurements)
-
-        transition_matrix = self.transition_matrices[-1]
-        projective_measurements = self.projective_measurements[-1]
-        total_state = self.process_word(total_state, transition_matrix, projective_measurements)
-        end_state, acceptance_probability, rejection_probability = total_state
-
-        error = abs(1 - acceptance_probability - rejection_probability)
-        return total_state[1], error
-
-    def process_word(self,
-                     total_state: State,
-                     transition_matrix: np.ndarray,
-                     projective_measurements: List[np.ndarray]) -> (State, np.ndarray, np.ndarray):
-
-        projective_measurement_accept = projective_measurements[0]
-        projective_measurement_reject = projective_measurements[1]
-        projective_measurement_non = projective_measurements[2]
-
-        state = total_state[0]
-
-        new_state = projective_measurement_non @ transition_matrix @ state
-
-        acceptance_probability = total_state[1]
-        v = projective_measurement_accept @ transition_matrix @ state
-        acceptance_probability += np.vdot(v, v)
-
-        rejection_probability = total_state[2]
-        v = projective_measurement_reject @ transition_matrix @ state
-        rejection_probability += np.vdot(v, v)
-
-        return new_state, acceptance_probability, rejection_probability
+        self.projective_measurements = get_projective_measurements([[to_backend(m, backend) for m in measurement]
+                                                                    for measurement in projective_measurements])
+        # precision - 'double' or 'single', in single precision states are float32 (complex64) and the error
+        #             of every result is at least the bound of its rounding errors, see Kernel.error_bounds
+        self.precision = precision
+
+    def build_kernel(self) -> Kernel:
+        return Kernel(MEASURE_MANY, self.alphabet, self.initial_state,
+                      [fuse_measurement(transition_matrix, projective_measurements)
+                       for transition_matrix, projective_measurements
+                       in zip(self.transition_matrices, self.projective_measurements)],
+                      end_symbol=len(self.transition_matrices) - 1, precision=self.precision)
 
 
 def example():
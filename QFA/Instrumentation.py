@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import defaultdict
+
+# Opt-in instrumentation of the evaluation. A Collector is passed to Automaton.process, process_many and
+# process_trie, to LanguageChecker or to LanguageGenerator; without one nothing is measured and the only cost
+# is one check per call, none per letter.
+#
+# Records are keyed by a name (the class of the automaton, or LanguageGenerator) and a phase:
+#   'encode' - words translated to arrays of symbols
+#   'transitions' - transition matrices applied to the states, for measure-many automata with the measurements
+#   'measurement' - acceptance probabilities read from the final states
+#   'evaluate' - LanguageChecker evaluating words, includes the phases above
+#   'criteria' - LanguageChecker updating the statistics and deciding the acceptance conditions
+#   'generation' - LanguageGenerator drawing words
+# and counters: 'words', 'letters', 'matrix_products' (calls of @) and 'matrix_vector_products'
+# (columns advanced by them, one per word and letter in a batch).
+
+now = time.perf_counter
+
+
+class Collector:
+
+    def __init__(self):
+        # records may come from the threads of a ParallelExecutor
+        self.lock = threading.Lock()
+        # (name, phase) - total seconds and number of records
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        # (name, counter) - total
+        self.counters = defaultdict(int)
+
+    def record(self, name: str, phase: str, seconds: float, **counters):
+        with self.lock:
+            self.seconds[name, phase] += seconds
+            self.calls[name, phase] += 1
+            for counter, value in counters.items():
+                self.counters[name, counter] += int(value)
+
+    def probe(self, name: str) -> 'Probe':
+        return Probe(self, name)
+
+    def report(self) -> dict:
+        # {name: {'phases': {phase: {'seconds': ..., 'calls': ...}}, counter: total, ...}}
+        with self.lock:
+            report = defaultdict(lambda: {'phases': {}})
+            for (name, phase), seconds in self.seconds.items():
+                report[name]['phases'][phase] = {'seconds': seconds, 'calls': self.calls[name, phase]}
+            for (name, counter), value in self.counters.items():
+                report[name][counter] = value
+            return dict(report)
+
+    def reset(self):
+        with self.lock:
+            self.seconds.clear()
+            self.calls.clear()
+            self.counters.clear()
+
+
+class Probe:
+    # a collector bound to a name, passed to the kernel
+
+    __slots__ = ('collector', 'name')
+
+    def __init__(self, collector: Collector, name: str):
+        self.collector = collector
+        self.name = name
+
+    def record(self, phase: str, seconds: float, **counters):
+        self.collector.record(self.name, phase, seconds, **counters)
@@ -0,0 +1,523 @@
+import numpy as np
+from os.path import commonprefix
+from typing import List
+
+from QFA.Backend import SPARSE, detect_backend, is_real, is_sparse, to_backend, to_dense
+from QFA.Cache import LRUCache
+from QFA.Instrumentation import Probe, now
+from QFA.Operators import structured
+
+# how the acceptance probability is read from the state
+# PFA - linear functional of the state
+LINEAR = 'linear'
+# MO_1QFA - norm squared of the projection of the state, measured once after the whole word
+MEASURE_ONCE = 'measure_once'
+# MM_1QFA and GQFA - accepting and rejecting probabilities are accumulated after every letter
+MEASURE_MANY = 'measure_many'
+
+# precision of the states and operators: automata with real entries (also when given as complex arrays) are evaluated
+# with real numbers, float64 for DOUBLE and float32 for SINGLE, others with complex128 or complex64
+DOUBLE = 'double'
+SINGLE = 'single'
+DTYPES = {DOUBLE: (np.float64, np.complex128), SINGLE: (np.float32, np.complex64)}
+
+# a state of the kernel: (column vector, accumulated acceptance probability, accumulated rejection probability)
+# the probabilities are always 0 for LINEAR and MEASURE_ONCE kernels
+State = (np.ndarray, float, float)
+
+# number of matrix powers cached for every symbol
+POWER_CACHE_SIZE = 64
+# most words evaluated together by run_many and run_all
+BLOCK_SIZE = 4096
+
+
+class Kernel:
+    # Immutable, compiled form of an automaton used by all evaluation methods.
+    # All automata are brought to the same form: the state is a column vector, reading a symbol is a single
+    # matrix-vector product with operators[symbol]. For MEASURE_MANY kernels the operator of a symbol is
+    # the transition matrix fused with the measurement: [P_non @ U; P_acc @ U; P_rej @ U], so the non halting
+    # state and the accepted and rejected parts are obtained with one product.
+    # Matrices with a structure (diagonal, permutation, block-diagonal) are applied through structured[symbol],
+    # in O(n) instead of O(n^2), operators[symbol] is always the matrix.
+
+    __slots__ = ('kind', 'alphabet', 'symbols', 'table', 'size', 'backend', 'dtype', 'rounding', 'initial_state',
+                 'operators', 'structured', 'final', 'end_symbol', 'powers')
+
+    def __init__(self,
+                 kind: str,
+                 alphabet: str,
+                 initial_state: np.ndarray,
+                 operators: List[np.ndarray],
+                 final: np.ndarray = None,
+                 end_symbol: int = None,
+                 power_cache_size: int = POWER_CACHE_SIZE,
+                 precision: str = DOUBLE):
+        if precision not in DTYPES:
+            raise Exception('Unknown precision: ' + str(precision))
+        arrays = [initial_state] + list(operators) + ([final] if final is not None else [])
+        dtype = DTYPES[precision][0 if all(is_real(array) for array in arrays) else 1]
+        # sparse operators if any of the matrices is sparse, the state vectors are always dense
+        backend = detect_backend(operators)
+
+        set_attribute = super().__setattr__
+        set_attribute('kind', kind)
+        set_attribute('alphabet', alphabet)
+        # position of the first occurrence of every letter, the same as alphabet.index(letter)
+        set_attribute('symbols', {letter: i for i, letter in reversed(list(enumerate(alphabet)))})
+        # lookup table indexed by the byte value of a letter, used when the whole alphabet fits in latin-1
+        table = None
+        if all(ord(letter) < 256 for letter in alphabet):
+            table = np.full(256, -1, dtype=np.intp)
+            for letter, symbol in self.symbols.items():
+                table[ord(letter)] = symbol
+            table.flags.writeable = False
+        set_attribute('table', table)
+        set_attribute('size', int(np.prod(initial_state.shape)))
+        set_attribute('backend', backend)
+        set_attribute('dtype', dtype)
+        # unit roundoff of single precision, the error of every result is at least its bound, see error_bounds
+        # the results of double precision are not changed
+        set_attribute('rounding', float(np.finfo(np.float32).eps) / 2 if precision == SINGLE else 0.0)
+        set_attribute('initial_state', frozen(cast(np.ravel(to_dense(initial_state)), dtype)))
+        if backend == SPARSE:
+            # sparse matrices cannot be stacked, operators[symbol] is still the matrix of the symbol
+            set_attribute('operators', tuple(frozen(cast(to_backend(m, SPARSE), dtype)) for m in operators))
+        else:
+            # all operators stacked in one contiguous array: operators[symbol] is the matrix of the symbol
+            set_attribute('operators', frozen(np.ascontiguousarray(cast(np.stack(operators), dtype))))
+        set_attribute('structured', structured_operators(self.operators))
+        if final is not None:
+            # a measurement matrix follows the backend, an acceptance vector stays dense
+            final = to_backend(final, backend) if final.ndim == 2 else to_dense(final)
+            final = frozen(cast(final, dtype))
+        set_attribute('final', final)
+        set_attribute('end_symbol', end_symbol)
+        # powers of the operators used by run_rle, separate cache for every symbol
+        set_attribute('powers', [LRUCache(power_cache_size) for _ in range(len(operators))])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Kernel is immutable')
+
+    def fields(self) -> dict:
+        # everything needed to rebuild the kernel with restore, the power caches and the structured operators,
+        # which are rebuilt from the operators, are not included
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ('powers', 'structured')}
+
+    @staticmethod
+    def restore(fields: dict, power_cache_size: int = POWER_CACHE_SIZE) -> 'Kernel':
+        # rebuilds a kernel from fields() without copying the arrays, they can live in shared memory
+        kernel = object.__new__(Kernel)
+        for name, value in fields.items():
+            if isinstance(value, np.ndarray):
+                value = frozen(value)
+            object.__setattr__(kernel, name, value)
+        object.__setattr__(kernel, 'powers', [LRUCache(power_cache_size) for _ in range(len(kernel.operators))])
+        object.__setattr__(kernel, 'structured', structured_operators(kernel.operators))
+        return kernel
+
+    def __reduce__(self):
+        return Kernel.restore, (self.fields(), self.powers[0].maxsize)
+
+    def symbol(self, letter: str) -> int:
+        if letter not in self.symbols:
+            raise ValueError('Letter ' + repr(letter) + ' is not in the alphabet')
+        return self.symbols[letter]
+
+    def encode(self, word: str) -> np.ndarray:
+        # word as an array of symbols (positions of letters in the alphabet)
+        if self.table is not None:
+            try:
+                codes = self.table[np.frombuffer(word.encode('latin-1'), dtype=np.uint8)]
+            except UnicodeEncodeError:
+                codes = np.array([-1])
+            if np.any(codes < 0):
+                raise ValueError('Word ' + repr(word) + ' contains letters which are not in the alphabet')
+            return codes
+        return np.array([self.symbol(letter) for letter in word], dtype=np.intp)
+
+    def encode_many(self, words: List[str]) -> (np.ndarray, np.ndarray):
+        # all words encoded in one array, word i is codes[offsets[i]:offsets[i + 1]]
+        lengths = np.fromiter(map(len, words), dtype=np.intp, count=len(words))
+        offsets = np.zeros(len(words) + 1, dtype=np.intp)
+        np.cumsum(lengths, out=offsets[1:])
+        return self.encode(''.join(words)), offsets
+
+    def recode(self, alphabet: str, codes: np.ndarray) -> np.ndarray:
+        # codes of words over another alphabet (positions of letters in it) as symbols of this kernel
+        if alphabet == self.alphabet:
+            return codes
+        table = np.array([self.symbols.get(letter, -1) for letter in alphabet], dtype=np.intp)
+        codes = table[codes]
+        if np.any(codes < 0):
+            raise ValueError('Words contain letters which are not in the alphabet')
+        return codes
+
+    def start(self) -> State:
+        return self.initial_state, 0.0, 0.0
+
+    def step(self, state: State, symbol: int) -> State:
+        vector, acceptance_probability, rejection_probability = state
+        vector = self.structured[symbol] @ vector
+        if self.kind == MEASURE_MANY:
+            n = self.size
+            acceptance_probability += norm_squared(vector[n:2 * n])
+            rejection_probability += norm_squared(vector[2 * n:])
+            vector = vector[:n]
+        return vector, acceptance_probability, rejection_probability
+
+    def finish(self, state: State) -> (float, float):
+        if self.kind == MEASURE_MANY:
+            _, acceptance_probability, rejection_probability = self.step(state, self.end_symbol)
+            return acceptance_probability, abs(1 - acceptance_probability - rejection_probability)
+        elif self.kind == MEASURE_ONCE:
+            return norm_squared(self.final @ state[0]), 0
+        else:
+            return (self.final @ state[0]).real, 0
+
+    # probe - if given, the time and the number of products of every phase are recorded, see QFA.Instrumentation
+
+    def run(self, codes: np.ndarray, probe: Probe = None) -> (float, float):
+        if probe is not None:
+            start = now()
+        operators = self.structured
+        if self.kind != MEASURE_MANY:
+            state = self.initial_state
+            for symbol in codes.tolist():
+                state = operators[symbol] @ state
+            state = (state, 0.0, 0.0)
+        else:
+            state = self.start()
+            for symbol in codes.tolist():
+                state = self.step(state, symbol)
+
+        if probe is None:
+            return self.bounded(self.finish(state), len(codes))
+        return self.bounded(self.record_finish(probe, start, state, len(codes)), len(codes))
+
+    def record_finish(self, probe: Probe, start: float, state: State, products: int) -> (float, float):
+        measurement_start = now()
+        probe.record('transitions', measurement_start - start, matrix_products=products,
+                     matrix_vector_products=products)
+        result = self.finish(state)
+        probe.record('measurement', now() - measurement_start, matrix_products=1, matrix_vector_products=1)
+        return result
+
+    def run_rle(self, codes: np.ndarray, probe: Probe = None) -> (float, float):
+        # same as run, but every run of repeated symbols is applied as a single power of the symbol's operator
+        if self.kind == MEASURE_MANY:
+            # the state is measured after every letter, a run cannot be replaced by one operator
+            return self.run(codes, probe)
+        if probe is not None:
+            start = now()
+        vector = self.initial_state
+        symbols, lengths = run_lengths(codes)
+        for symbol, length in zip(symbols.tolist(), lengths.tolist()):
+            vector = self.power(symbol, length) @ vector
+
+        if probe is None:
+            return self.bounded(self.finish((vector, 0.0, 0.0)), len(codes))
+        # products of the powers computed on the way are not counted
+        return self.bounded(self.record_finish(probe, start, (vector, 0.0, 0.0), len(symbols)), len(codes))
+
+    def bounded(self, result: (float, float), letters) -> (float, float):
+        # the result of words of the given lengths with every error raised to the bound of the rounding errors,
+        # only in single precision
+        if not self.rounding:
+            return result
+        probabilities, errors = result
+        return probabilities, np.maximum(errors, self.error_bounds(letters))
+
+    def error_bounds(self, letters):
+        # first order bounds of the rounding errors of the acceptance probabilities of words of the given lengths,
+        # for operators of norm at most 1 (stochastic or unitary): every product adds at most size * rounding
+        # to the error of the state, a norm squared doubles it and measure-many kernels sum the errors
+        # of the measurements after every letter
+        # the step by step evaluation with start, step and finish does not report them
+        products = np.asarray(letters, dtype=np.float64) + 1
+        if self.kind == MEASURE_MANY:
+            return products * (products + 1) * self.size * self.rounding
+        elif self.kind == MEASURE_ONCE:
+            return 2 * products * self.size * self.rounding
+        return products * self.size * self.rounding
+
+    def power(self, symbol: int, exponent: int) -> np.ndarray:
+        # operators[symbol] to the given power computed by repeated squaring,
+        # intermediate powers are cached as well, so a^1000 reuses a^500, a^250, ...
+        cache = self.powers[symbol]
+        result = cache.get(exponent)
+        if result is None:
+            if exponent == 1:
+                result = self.operators[symbol]
+            elif exponent % 2 == 0:
+                half = self.power(symbol, exponent // 2)
+                result = frozen(half @ half)
+            else:
+                result = frozen(self.power(symbol, exponent - 1) @ self.operators[symbol])
+            cache.put(exponent, result)
+        return result
+
+    def run_trie(self, words: List[str], probe: Probe = None) -> (np.ndarray, np.ndarray):
+        # visiting the words in lexicographic order is a depth-first walk of their prefix trie,
+        # the states on the current path are kept on a stack and shared by all words below them
+        probabilities = np.zeros(len(words))
+        errors = np.zeros(len(words))
+        if probe is not None:
+            start = now()
+            measurement_seconds = 0.0
+            products = 0
+
+        path = [self.start()]
+        previous_word = ''
+        for i in sorted(range(len(words)), key=words.__getitem__):
+            word = words[i]
+            depth = len(commonprefix([previous_word, word]))
+            del path[depth + 1:]
+            for symbol in self.encode(word[depth:]).tolist():
+                path.append(self.step(path[-1], symbol))
+            if probe is None:
+                probabilities[i], errors[i] = self.finish(path[-1])
+            else:
+                products += len(word) - depth
+                measurement_start = now()
+                probabilities[i], errors[i] = self.finish(path[-1])
+                measurement_seconds += now() - measurement_start
+            previous_word = word
+
+        if probe is not None:
+            # encoding of the words is included in the transitions, only letters of distinct prefixes are counted
+            probe.record('transitions', now() - start - measurement_seconds, words=len(words), letters=products,
+                         matrix_products=products, matrix_vector_products=products)
+            probe.record('measurement', measurement_seconds, matrix_products=len(words),
+                         matrix_vector_products=len(words))
+        return self.bounded((probabilities, errors), np.fromiter(map(len, words), dtype=np.intp, count=len(words)))
+
+    def run_many(self, codes: np.ndarray, offsets: np.ndarray, probe: Probe = None, block_size: int = BLOCK_SIZE) \
+            -> (np.ndarray, np.ndarray):
+        # advances the words together, every column of the state matrix belongs to one word
+        # the words are sorted by decreasing length and advanced in blocks of at most block_size consecutive words,
+        # so memory does not depend on the number of words, and the words of a block still being read always form
+        # a prefix of its columns; at each position the columns are grouped by symbol and every group is advanced
+        # with one matrix product
+        if probe is not None:
+            start = now()
+        lengths = np.diff(offsets)
+        count = len(lengths)
+        order = np.argsort(-lengths, kind='stable')
+        negative_lengths = -lengths[order]
+        starts = offsets[:-1][order]
+
+        acceptance_probabilities = np.zeros(count)
+        errors = np.zeros(count)
+        products = 0
+        measurement_time = 0.0
+        for block in range(0, count, block_size):
+            columns = slice(block, block + block_size)
+            block_products, measurement_start = self.run_block(codes, starts[columns], negative_lengths[columns],
+                                                               acceptance_probabilities[columns], errors[columns])
+            products += block_products
+            measurement_time += now() - measurement_start
+
+        measure_many = self.kind == MEASURE_MANY
+        if probe is not None:
+            # every word reads its letters, measure-many words the end symbol as well
+            columns = int(lengths.sum()) + (count if measure_many else 0)
+            probe.record('transitions', now() - start - measurement_time, matrix_products=products,
+                         matrix_vector_products=columns)
+
+        probabilities = np.empty(count)
+        probabilities[order] = acceptance_probabilities
+        unsorted_errors = np.empty(count)
+        unsorted_errors[order] = errors
+
+        if probe is not None:
+            measured = 0 if measure_many else 1
+            probe.record('measurement', measurement_time, matrix_products=measured,
+                         matrix_vector_products=measured * count)
+        return self.bounded((probabilities, unsorted_errors), lengths)
+
+    def run_block(self, codes: np.ndarray, starts: np.ndarray, negative_lengths: np.ndarray,
+                  acceptance_probabilities: np.ndarray, errors: np.ndarray) -> (int, float):
+        # one block of run_many: the words starting at starts, sorted by decreasing length,
+        # their probabilities and errors are written to the given arrays
+        # returns the number of matrix products and the time the measurement started
+        count = len(starts)
+        n = self.size
+        states = np.repeat(self.initial_state[:, np.newaxis], count, axis=1)
+        rejection_probabilities = np.zeros(count)
+
+        measure_many = self.kind == MEASURE_MANY
+        steps = -negative_lengths[0] if count else 0
+        # the end symbol is read one position after the last letter of a word
+        if measure_many and count:
+            steps += 1
+
+        products = 0
+        for position in range(steps):
+            reading = np.searchsorted(negative_lengths, -position, side='left')
+            symbols = codes[starts[:reading] + position]
+            if measure_many:
+                ending = np.searchsorted(negative_lengths, -position, side='right')
+                symbols = np.concatenate([symbols, np.full(ending - reading, self.end_symbol, dtype=np.intp)])
+
+            unique_symbols = np.unique(symbols)
+            for symbol in unique_symbols:
+                columns = np.nonzero(symbols == symbol)[0]
+                if len(columns) == len(symbols):
+                    columns = slice(0, len(symbols))
+                new_states = self.structured[symbol] @ states[:, columns]
+                if measure_many:
+                    acceptance_probabilities[columns] += norms_squared(new_states[n:2 * n])
+                    rejection_probabilities[columns] += norms_squared(new_states[2 * n:])
+                    new_states = new_states[:n]
+                states[:, columns] = new_states
+            products += len(unique_symbols)
+
+        measurement_start = now()
+        if self.kind == MEASURE_MANY:
+            errors[:] = np.abs(1 - acceptance_probabilities - rejection_probabilities)
+        elif self.kind == MEASURE_ONCE:
+            acceptance_probabilities[:] = norms_squared(self.final @ states)
+        else:
+            acceptance_probabilities[:] = (self.final @ states).real
+        return products, measurement_start
+
+    def letter_symbols(self) -> List[int]:
+        # symbols of the distinct letters of the alphabet, in the order of the alphabet
+        return sorted(set(self.symbols.values()))
+
+    def run_all(self, max_len: int, min_len: int = 0, dfa=None, block_size: int = BLOCK_SIZE, probe: Probe = None):
+        # evaluates every word of lengths from min_len to max_len without listing the words: a depth-first walk
+        # of the tree of all words, where the children of a group of words are computed from the states of the group
+        # with one matrix product per letter, so the state of every prefix is computed only once
+        # yields (length, first, probabilities, errors, labels) for groups of at most block_size words of one length,
+        # result i belongs to the word of rank first + i among the words of that length, see word_at
+        # dfa - a DFA over the alphabet of the kernel advanced in the same walk, labels[i] is True if it accepts
+        #       the word, labels is None if no DFA is given
+        # at most (letters - 1) * max_len + 1 groups of states are kept at a time
+        if probe is not None:
+            start = now()
+            measurement_seconds = 0.0
+            products = 0
+            columns = 0
+            groups = 0
+            words = 0
+        letters = self.letter_symbols()
+        dfa_states = np.full(1, dfa.start, dtype=np.intp) if dfa is not None else None
+        stack = [(0, 0, self.initial_state[:, np.newaxis], np.zeros(1), np.zeros(1), dfa_states)]
+        while stack:
+            length, first, vectors, acceptance_probabilities, rejection_probabilities, dfa_states = stack.pop()
+            if length >= min_len:
+                if probe is not None:
+                    measurement_start = now()
+                probabilities, errors = self.finish_columns(vectors, acceptance_probabilities, rejection_probabilities)
+                labels = dfa.accepting[dfa_states] if dfa is not None else None
+                if probe is not None:
+                    measurement_seconds += now() - measurement_start
+                    groups += 1
+                    words += len(probabilities)
+                yield (length, first) + self.bounded((probabilities, errors), length) + (labels,)
+            if length == max_len:
+                continue
+
+            vectors, acceptance_probabilities, rejection_probabilities = self.expand_columns(
+                vectors, acceptance_probabilities, rejection_probabilities, letters)
+            if dfa is not None:
+                dfa_states = dfa.transitions[dfa_states][:, letters].ravel()
+            if probe is not None:
+                products += len(letters)
+                columns += vectors.shape[1]
+            # the children are split into groups again, pushed in reverse, so the walk follows the lexicographic order
+            count = vectors.shape[1]
+            for group in reversed(range(0, count, block_size)):
+                columns_slice = slice(group, group + block_size)
+                stack.append((length + 1, first * len(letters) + group, vectors[:, columns_slice],
+                              acceptance_probabilities[columns_slice], rejection_probabilities[columns_slice],
+                              dfa_states[columns_slice] if dfa is not None else None))
+
+        if probe is not None:
+            probe.record('transitions', now() - start - measurement_seconds, words=words, letters=columns,
+                         matrix_products=products, matrix_vector_products=columns)
+            # one final product for every group of words
+            probe.record('measurement', measurement_seconds, matrix_products=groups, matrix_vector_products=words)
+
+    def expand_columns(self, vectors: np.ndarray, acceptance_probabilities: np.ndarray,
+                       rejection_probabilities: np.ndarray, letters: List[int]):
+        # the states of every word (column) followed by every letter, the children of column j are the columns
+        # j * len(letters) to (j + 1) * len(letters) - 1
+        n = self.size
+        count = vectors.shape[1]
+        children = np.empty((n, count, len(letters)), dtype=self.dtype)
+        acceptance_children = np.repeat(acceptance_probabilities, len(letters)).reshape(count, len(letters))
+        rejection_children = np.repeat(rejection_probabilities, len(letters)).reshape(count, len(letters))
+        for i, symbol in enumerate(letters):
+            new_states = self.structured[symbol] @ vectors
+            if self.kind == MEASURE_MANY:
+                acceptance_children[:, i] += norms_squared(new_states[n:2 * n])
+                rejection_children[:, i] += norms_squared(new_states[2 * n:])
+                new_states = new_states[:n]
+            children[:, :, i] = new_states
+        return (children.reshape(n, count * len(letters)), acceptance_children.ravel(),
+                rejection_children.ravel())
+
+    def finish_columns(self, vectors: np.ndarray, acceptance_probabilities: np.ndarray,
+                       rejection_probabilities: np.ndarray) -> (np.ndarray, np.ndarray):
+        # finish for every column of the states
+        if self.kind == MEASURE_MANY:
+            n = self.size
+            new_states = self.structured[self.end_symbol] @ vectors
+            acceptance_probabilities = acceptance_probabilities + norms_squared(new_states[n:2 * n])
+            rejection_probabilities = rejection_probabilities + norms_squared(new_states[2 * n:])
+            return acceptance_probabilities, np.abs(1 - acceptance_probabilities - rejection_probabilities)
+        elif self.kind == MEASURE_ONCE:
+            return norms_squared(self.final @ vectors), np.zeros(vectors.shape[1])
+        else:
+            return (self.final @ vectors).real, np.zeros(vectors.shape[1])
+
+    def word_at(self, length: int, rank: int) -> str:
+        # the word of the given length at the given rank in the lexicographic order of run_all
+        letters = self.letter_symbols()
+        symbols = []
+        for _ in range(length):
+            rank, digit = divmod(rank, len(letters))
+            symbols.append(letters[digit])
+        return ''.join(self.alphabet[symbol] for symbol in reversed(symbols))
+
+
+def structured_operators(operators) -> tuple:
+    # operators[symbol] as an operator of its structure, see QFA.Operators, sparse matrices are kept
+    return tuple(operator if is_sparse(operator) else structured(operator) for operator in operators)
+
+
+def cast(array, dtype):
+    # the imaginary parts of real matrices given as complex arrays are dropped
+    if np.iscomplexobj(array.data if is_sparse(array) else array) and not np.issubdtype(dtype, np.complexfloating):
+        array = array.real
+    return array.astype(dtype)
+
+
+def run_lengths(codes: np.ndarray) -> (np.ndarray, np.ndarray):
+    # run-length encoding: the repeated symbols and the lengths of their runs
+    if len(codes) == 0:
+        return codes, codes
+    starts = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1])
+    return codes[starts], np.diff(np.append(starts, len(codes)))
+
+
+def frozen(array):
+    if is_sparse(array):
+        for component in (array.data, array.indices, array.indptr):
+            component.flags.writeable = False
+    else:
+        array.flags.writeable = False
+    return array
+
+
+def norm_squared(vector: np.ndarray) -> float:
+    return np.vdot(vector, vector).real
+
+
+def norms_squared(matrix: np.ndarray) -> np.ndarray:
+    # norm squared of every column
+    if np.iscomplexobj(matrix):
+        return np.einsum('ij,ij->j', matrix.real, matrix.real) + np.einsum('ij,ij->j', matrix.imag, matrix.imag)
+    return np.einsum('ij,ij->j', matrix, matrix)
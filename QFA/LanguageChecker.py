@@ -1,150 +1,327 @@
+import numpy as np
+from itertools import islice
+from typing import Iterable, List
+
 from QFA.Automaton import Automaton
+from QFA.DFA import DFA
+from QFA.Instrumentation import Collector, now
+from QFA.Kernel import BLOCK_SIZE
+from QFA.LanguageGenerator import LanguageGenerator
+from QFA.ParallelExecutor import ParallelExecutor
+from QFA.ResultStatistics import LANGUAGE, NOT_IN_LANGUAGE, ResultStatistics
+from QFA.WordCorpus import WordCorpus
 
 
 class LanguageChecker:
     def __init__(self,
                  automaton: Automaton,
                  language: list,
-                 not_in_language: list):
+                 not_in_language: list = None,
+                 mode: str = 'batch',
+                 executor: ParallelExecutor = None,
+                 collector: Collector = None):
+        # the words can be given as lists of strings or as WordCorpus objects evaluated from their symbols,
+        # a labelled corpus given as language alone is split into the words in and not in the language
+        if isinstance(language, WordCorpus) and not_in_language is None:
+            check_labelled(language)
+            language, not_in_language = language.in_language(), language.not_in_language()
         self.language = language
         self.not_in_language = not_in_language
         self.automaton = automaton
+        # 'batch' - all words are advanced together by automaton.process_many
+        # 'trie' - shared prefixes of the words are processed only once by automaton.process_trie
+        if mode not in ('batch', 'trie'):
+            raise Exception('Unknown evaluation mode: ' + mode)
+        self.mode = mode
+        # if given, the words are split into chunks evaluated by the executor's workers
+        self.executor = executor
+        # if given, time spent evaluating words and deciding the conditions is recorded in it, by automaton class,
+        # with the phases of the automaton's evaluation unless the words are evaluated by an executor
+        self.collector = collector
         self.accepted = {}
-        self.lang_results = []
-        self.not_lang_results = []
+        # for every refuted condition: ('language' or 'not_in_language', index of a word refuting it)
+        self.witnesses = {}
+        # for every refuted condition the word refuting it, filled by check_exhaustive
+        self.witness_words = {}
+        # results stored by columns: acceptance probability, error and the index of the word in its list,
+        # every column is kept as a list of arrays which add_words appends to, see result_column
+        self._results = {}
+        # the lists of words owned by the checker, which add_words extends
+        self._word_lists = None
+        self.lang_probabilities = np.zeros(0)
+        self.lang_errors = np.zeros(0)
+        self.lang_indices = np.zeros(0, dtype=np.int64)
+        self.not_lang_probabilities = np.zeros(0)
+        self.not_lang_errors = np.zeros(0)
+        self.not_lang_indices = np.zeros(0, dtype=np.int64)
+        # aggregates of the results, filled by run, add_words and check_stream
+        self.statistics = None
+
+    def result_column(name: str) -> property:
+        # the parts of the column are concatenated when it is read, so adding words is linear in the new words
+        def get(self) -> np.ndarray:
+            parts = self._results[name]
+            if len(parts) > 1:
+                parts[:] = [np.concatenate(parts)]
+            return parts[0]
+
+        def set(self, value: np.ndarray):
+            self._results[name] = [value]
+
+        return property(get, set)
+
+    lang_probabilities = result_column('lang_probabilities')
+    lang_errors = result_column('lang_errors')
+    lang_indices = result_column('lang_indices')
+    not_lang_probabilities = result_column('not_lang_probabilities')
+    not_lang_errors = result_column('not_lang_errors')
+    not_lang_indices = result_column('not_lang_indices')
+    del result_column
 
     def check_language(self):
+        # all conditions are decided in one vectorised pass over the results, see ResultStatistics
 
         self.run()
 
-        cutpoint = self.check_cutpoint()
-        if cutpoint:
-            self.accepted['cutpoint'] = cutpoint
-
-        result = self.check_isolated_cutpoint()
-        if result:
-            isolated_cutpoint, epsilon, error = result
-            self.accepted['isolated_cutpoint'] = (isolated_cutpoint, epsilon, error)
+        self.decide()
 
-        monte_carlo_eps = self.check_monte_carlo()
-        if monte_carlo_eps:
-            self.accepted['Monte_Carlo'] = monte_carlo_eps
+        return self.accepted
 
-        bounded_err = self.check_bounded_error()
-        if bounded_err:
-            self.accepted['bounded'] = bounded_err
+    @property
+    def lang_results(self) -> np.ndarray:
+        # (probability, error) of every word in the language, one row per word
+        return np.column_stack([self.lang_probabilities, self.lang_errors])
+
+    @property
+    def not_lang_results(self) -> np.ndarray:
+        return np.column_stack([self.not_lang_probabilities, self.not_lang_errors])
+
+    def save_results(self, path: str):
+        # the results as arrays of an .npz file, they can be read back by load_results without the automaton
+        np.savez(path,
+                 lang_probabilities=self.lang_probabilities, lang_errors=self.lang_errors,
+                 lang_indices=self.lang_indices, not_lang_probabilities=self.not_lang_probabilities,
+                 not_lang_errors=self.not_lang_errors, not_lang_indices=self.not_lang_indices)
+
+    def load_results(self, path: str):
+        # replaces the results with the saved ones and decides the conditions from them,
+        # witness indices are positions in the loaded arrays, the indices of the words are in *_indices
+        with np.load(path) as results:
+            self.lang_probabilities = results['lang_probabilities']
+            self.lang_errors = results['lang_errors']
+            self.lang_indices = results['lang_indices']
+            self.not_lang_probabilities = results['not_lang_probabilities']
+            self.not_lang_errors = results['not_lang_errors']
+            self.not_lang_indices = results['not_lang_indices']
+
+        self.statistics = ResultStatistics()
+        self.update_statistics(True, self.lang_probabilities, self.lang_errors)
+        self.update_statistics(False, self.not_lang_probabilities, self.not_lang_errors)
+
+        self.decide()
+        return self.accepted
 
-        positive = self.check_positive_unbounded()
-        if positive:
-            self.accepted['positive_unbounded'] = True
+    def run(self):
+        if isinstance(self.language, WordCorpus) or isinstance(self.not_in_language, WordCorpus):
+            # corpora are evaluated separately, so no strings are created
+            lang_probabilities, lang_errors = self.evaluate(self.language)
+            not_lang_probabilities, not_lang_errors = self.evaluate(self.not_in_language)
+            probabilities = np.concatenate([lang_probabilities, not_lang_probabilities])
+            errors = np.concatenate([lang_errors, not_lang_errors])
+        else:
+            # both lists are evaluated together, in trie mode words in and out of the language share prefixes as well
+            probabilities, errors = self.evaluate(list(self.language) + list(self.not_in_language))
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        errors = np.asarray(errors, dtype=np.float64)
+        count = len(self.language)
+        self.lang_probabilities = probabilities[:count]
+        self.lang_errors = errors[:count]
+        self.lang_indices = np.arange(count, dtype=np.int64)
+        self.not_lang_probabilities = probabilities[count:]
+        self.not_lang_errors = errors[count:]
+        self.not_lang_indices = np.arange(len(probabilities) - count, dtype=np.int64)
+
+        self.statistics = ResultStatistics()
+        self.update_statistics(True, self.lang_probabilities, self.lang_errors)
+        self.update_statistics(False, self.not_lang_probabilities, self.not_lang_errors)
+
+    def add_words(self, in_language: Iterable[str] = (), not_in_language: Iterable[str] = ()):
+        # grows the sample without re-running the words checked before,
+        # only the new words are evaluated and the verdicts are updated from self.statistics
+        # after check_stream the words and results streamed before are not kept, the indices of the new words
+        # still count all words checked, as the indices of the witnesses do
+        in_language = list(in_language)
+        not_in_language = list(not_in_language)
+        if self.statistics is None:
+            self.run()
 
-        negative = self.check_negative_unbounded()
-        if negative:
-            self.accepted['negative_unbounded'] = True
+        probabilities, errors = self.evaluate(in_language + not_in_language)
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        errors = np.asarray(errors, dtype=np.float64)
+        count = len(in_language)
+        results = self._results
+        results['lang_probabilities'].append(probabilities[:count])
+        results['lang_errors'].append(errors[:count])
+        results['lang_indices'].append(np.arange(count, dtype=np.int64) + self.statistics.lang_count)
+        results['not_lang_probabilities'].append(probabilities[count:])
+        results['not_lang_errors'].append(errors[count:])
+        results['not_lang_indices'].append(np.arange(len(probabilities) - count, dtype=np.int64) +
+                                           self.statistics.not_lang_count)
+        # the words are appended in place to copies of the given lists (or corpora) made by the first call
+        if self._word_lists is None or self._word_lists[0] is not self.language \
+                or self._word_lists[1] is not self.not_in_language:
+            self.language, self.not_in_language = list(self.language), list(self.not_in_language)
+            self._word_lists = (self.language, self.not_in_language)
+        self.language.extend(in_language)
+        self.not_in_language.extend(not_in_language)
+
+        self.update_statistics(True, probabilities[:count], errors[:count])
+        self.update_statistics(False, probabilities[count:], errors[count:])
+
+        self.decide()
+        return self.accepted
 
+    def evaluate(self, words: List[str]):
+        if self.collector is None:
+            if self.executor is not None:
+                return self.executor.run(self.automaton, words, self.mode)
+            elif self.mode == 'trie':
+                return self.automaton.process_trie(words)
+            else:
+                return self.automaton.process_many(words)
+
+        start = now()
+        if self.executor is not None:
+            results = self.executor.run(self.automaton, words, self.mode)
+        elif self.mode == 'trie':
+            results = self.automaton.process_trie(words, collector=self.collector)
+        else:
+            results = self.automaton.process_many(words, collector=self.collector)
+        self.collector.record(self.collector_name(), 'evaluate', now() - start)
+        return results
+
+    def update_statistics(self, in_language: bool, probabilities: np.ndarray, errors: np.ndarray):
+        if self.collector is None:
+            self.statistics.update(in_language, probabilities, errors)
+            return
+        start = now()
+        self.statistics.update(in_language, probabilities, errors)
+        self.collector.record(self.collector_name(), 'criteria', now() - start)
+
+    def decide(self):
+        # the accepted conditions and the witnesses of the refuted ones, from self.statistics
+        if self.collector is not None:
+            start = now()
+        self.accepted = self.statistics.accepted()
+        self.witnesses = self.statistics.witnesses()
+        if self.collector is not None:
+            self.collector.record(self.collector_name(), 'criteria', now() - start)
+
+    def collector_name(self) -> str:
+        return type(self.automaton).__name__ if self.automaton is not None else type(self).__name__
+
+    def check_stream(self, labelled_words: Iterable = None, chunk_size: int = 10000, bins: int = 100):
+        # checks the language without keeping the words or the results, only self.statistics is kept
+        # labelled_words - iterable of (word, True if the word is in the language) pairs, a labelled WordCorpus
+        #   or the path of a corpus file, which is memory-mapped and read chunk by chunk,
+        #   by default self.language and self.not_in_language are consumed, they can be any iterables or corpora
+        # results are evaluated in chunks of chunk_size words, so memory does not depend on the number of words
+        self.statistics = ResultStatistics(bins)
+        if isinstance(labelled_words, str):
+            labelled_words = WordCorpus.load(labelled_words)
+        if labelled_words is None:
+            for in_language, words in [(True, self.language), (False, self.not_in_language)]:
+                for chunk in chunks(words, chunk_size):
+                    probabilities, errors = self.evaluate(chunk)
+                    self.update_statistics(in_language, probabilities, errors)
+        elif isinstance(labelled_words, WordCorpus):
+            check_labelled(labelled_words)
+            for chunk in chunks(labelled_words, chunk_size):
+                probabilities, errors = self.evaluate(chunk)
+                self.update_statistics(True, probabilities[chunk.labels], errors[chunk.labels])
+                self.update_statistics(False, probabilities[~chunk.labels], errors[~chunk.labels])
+        else:
+            labelled_words = iter(labelled_words)
+            for chunk in iter(lambda: list(islice(labelled_words, chunk_size)), []):
+                probabilities, errors = self.evaluate([word for (word, in_language) in chunk])
+                labels = np.array([in_language for (word, in_language) in chunk], dtype=bool)
+                self.update_statistics(True, probabilities[labels], errors[labels])
+                self.update_statistics(False, probabilities[~labels], errors[~labels])
+
+        self.decide()
         return self.accepted
 
-    def run(self):
-        self.lang_results = [self.automaton.process(word) for word in self.language]
-        self.not_lang_results = [self.automaton.process(word) for word in self.not_in_language]
+    def check_exhaustive(self, regex, max_len: int, min_len: int = 0, block_size: int = BLOCK_SIZE,
+                         bins: int = 100):
+        # checks the language on every word of lengths from min_len to max_len, so the conditions are exact
+        # on this finite domain instead of depending on a sample
+        # regex - regular expression of the language over the alphabet of the automaton (as in LanguageGenerator)
+        #         or a DFA of it
+        # the words are never listed, the states of their prefixes are shared in a depth-first walk of all words,
+        # see Kernel.run_all, and only self.statistics is kept, as in check_stream
+        # self.witness_words has the word refuting every refuted condition, the indices in self.witnesses count
+        # the words in and not in the language in the order of the walk
+        kernel = self.automaton.compile()
+        dfa = regex if isinstance(regex, DFA) else LanguageGenerator(regex, kernel.alphabet).get_dfa()
+        probe = self.collector.probe(self.collector_name()) if self.collector is not None else None
+        self.statistics = ResultStatistics(bins)
+        # words of the current aggregates, decoded while the group of words they come from is known
+        words = {}
+        for length, first, probabilities, errors, labels in kernel.run_all(max_len, min_len, dfa, block_size, probe):
+            offsets = {LANGUAGE: self.statistics.lang_count, NOT_IN_LANGUAGE: self.statistics.not_lang_count}
+            self.update_statistics(True, probabilities[labels], errors[labels])
+            self.update_statistics(False, probabilities[~labels], errors[~labels])
+            for partition, index in self.statistics.indices() - words.keys():
+                ranks = np.flatnonzero(labels if partition == LANGUAGE else ~labels)
+                words[partition, index] = kernel.word_at(length, first + int(ranks[index - offsets[partition]]))
+            words = {key: words[key] for key in self.statistics.indices()}
+
+        self.decide()
+        self.witness_words = {condition: words.get(witness) for condition, witness in self.witnesses.items()}
+        return self.accepted
 
     def check_cutpoint(self):
-        cutpoint = 1
-        err = None
-        if not self.lang_results or not self.not_lang_results:
+        if self.statistics is None:
             self.run()
-        if not self.lang_results:
-            raise Exception("Cannot calculate cutpoint because there are no words in the language")
-        for (p_for_word, err_for_word) in self.lang_results:
-            if p_for_word < cutpoint:
-                cutpoint = p_for_word
-                err = err_for_word
-
-        for (p_for_word, err_for_word) in self.not_lang_results:
-            if p_for_word > cutpoint + err + err_for_word:
-                return False
-
-        return cutpoint
+        return self.statistics.cutpoint()
 
     def check_isolated_cutpoint(self):
-        cutpoint_l = 1
-        err = None
-        if not self.lang_results or not self.not_lang_results:
+        if self.statistics is None:
             self.run()
-
-        for (p_for_word, err_for_word) in self.lang_results:
-            if p_for_word < cutpoint_l:
-                cutpoint_l = p_for_word
-                err = err_for_word
-
-        cutpoint_not_l = 0
-        err_not_l = None
-        for (p_for_word, err_for_word) in self.not_lang_results:
-            if p_for_word > cutpoint_not_l:
-                cutpoint_not_l = p_for_word
-                err_not_l = err_for_word
-
-        error = max(err, err_not_l)
-        cutpoint = (cutpoint_l + cutpoint_not_l) / 2
-        epsilon = cutpoint - cutpoint_not_l
-
-        if cutpoint_not_l > cutpoint + error:
-            return False
-        else:
-            return cutpoint, epsilon, error
+        return self.statistics.isolated_cutpoint()
 
     def check_monte_carlo(self):
-        if not self.lang_results or not self.not_lang_results:
+        if self.statistics is None:
             self.run()
-
-        for (p_for_word, err_for_word) in self.lang_results:
-            if p_for_word < 1 - err_for_word or p_for_word > 1 + err_for_word:
-                return False
-        epsilon = 0
-        error = None
-        for (p_for_word, err_for_word) in self.not_lang_results:
-            if p_for_word > epsilon:
-                epsilon = p_for_word
-                error = err_for_word
-
-        if epsilon >= 1/2 - error:
-            return False
-
-        return epsilon
+        return self.statistics.monte_carlo()
 
     def check_bounded_error(self):
-        epsilon = 0
-        if not self.lang_results or not self.not_lang_results:
+        if self.statistics is None:
             self.run()
-
-        for (p_for_word, err_for_word) in self.lang_results:
-            if p_for_word < 1 - epsilon - err_for_word:
-                epsilon = 1 - p_for_word - err_for_word
-
-        for (p_for_word, err_for_word) in self.not_lang_results:
-            if p_for_word > epsilon + err_for_word:
-                epsilon = p_for_word + err_for_word
-
-        if epsilon >= 1/2:
-            return False
-
-        return epsilon
+        return self.statistics.bounded_error()
 
     def check_positive_unbounded(self):
-        if not self.lang_results:
+        if self.statistics is None:
             self.run()
-
-        for (p_for_word, err_for_word) in self.lang_results:
-            if 0 - err_for_word < p_for_word < 0 + err_for_word:
-                return False
-        return True
+        return self.statistics.positive_unbounded()
 
     def check_negative_unbounded(self):
-        if not self.lang_results:
+        if self.statistics is None:
             self.run()
+        return self.statistics.negative_unbounded()
+
+
+def check_labelled(corpus: WordCorpus):
+    if corpus.labels is None:
+        raise ValueError('corpus has no labels')
 
-        for (p_for_word, err_for_word) in self.lang_results:
-            if p_for_word < 1 - err_for_word or p_for_word > 1 + err_for_word:
-                return False
 
-        return True
+def chunks(words: Iterable, chunk_size: int):
+    # consecutive lists of chunk_size words, views for a WordCorpus
+    if isinstance(words, WordCorpus):
+        for start in range(0, len(words), chunk_size):
+            yield words[start:start + chunk_size]
+        return
+    words = iter(words)
+    for chunk in iter(lambda: list(islice(words, chunk_size)), []):
+        yield chunk
@@ -1,6 +1,15 @@
 import re
 import random
 import math
+import numpy as np
+
+from QFA.DFA import DFA, regex_to_dfa
+from QFA.Instrumentation import Collector, now
+from QFA.WordCorpus import CorpusWriter, WordCorpus, decode_words, symbol_dtype, take_words
+
+# constants of the 64-bit polynomial hash used to find duplicate words, arithmetic wraps around modulo 2^64
+HASH_BASE = 0x100000001b3
+HASH_LENGTH = 0x9e3779b97f4a7c15
 
 
 def parse_alphabet(alphabet, regex):
@@ -11,15 +20,27 @@ class LanguageGenerator:
 
     def __init__(self,
                  regex: str,
-                 alphabet: str):
+                 alphabet: str,
+                 collector: Collector = None):
 
         regex = parse_alphabet(alphabet, regex)
 
         self.regex = regex
         self.alphabet = alphabet
+        # DFA of the regex, built on first use by get_dfa
+        self.dfa = None
+        # if given, time spent drawing words is recorded in it as the 'generation' phase, see QFA.Instrumentation
+        self.collector = collector
+
+    def get_dfa(self) -> DFA:
+        if self.dfa is None:
+            self.dfa = regex_to_dfa(self.regex, self.alphabet)
+        return self.dfa
 
     def get_language_sample(self, n=100, short_words_percent=30, max_len=100):
+        start = now()
         words = []
+        seen = set()
         not_in_lang = []
         in_lang = []
         p = re.compile(self.regex)
@@ -42,7 +63,7 @@ class LanguageGenerator:
                 border = max_len
 
             w = get_random_word(self.alphabet, random.randint(0, border))
-            while w in words:
+            while w in seen:
                 dec = random.random()
                 border = short_words_border
                 if dec > short_words_percent/100:
@@ -50,6 +71,7 @@ class LanguageGenerator:
 
                 w = get_random_word(self.alphabet, random.randint(0, border))
             words.append(w)
+            seen.add(w)
 
         for w in words:
             if p.fullmatch(w) is not None:
@@ -57,8 +79,157 @@ class LanguageGenerator:
             else:
                 not_in_lang.append(w)
 
+        self.record_generation(start, len(words))
+        return in_lang, not_in_lang
+
+    def get_random_sample(self, n=100, max_len=100, min_len=0, seed=None, encoded=False, batch_size=100000,
+                          corpus=False):
+        # n distinct words with uniformly drawn lengths and letters, generated in batches with numpy
+        # seed - int or numpy.random.Generator, the same seed gives the same sample
+        # encoded - also return both lists as (codes, offsets), word i is codes[offsets[i]:offsets[i + 1]]
+        #           and the codes are positions of letters in the alphabet, as in Kernel.encode_many
+        # corpus - return a labelled WordCorpus of the words in the order they were drawn instead of lists,
+        #          no strings are created
+        batches = list(self.random_batches(n, max_len, min_len, seed, batch_size))
+        codes = np.concatenate([b.symbols for b in batches])
+        offsets = np.zeros(n + 1, dtype=np.intp)
+        np.cumsum(np.concatenate([b.lengths() for b in batches]), out=offsets[1:])
+        accepted = np.concatenate([b.labels for b in batches])
+        if corpus:
+            return WordCorpus(self.alphabet, codes, offsets, accepted)
+
+        in_lang_encoded = take_words(codes, offsets, np.flatnonzero(accepted))
+        not_in_lang_encoded = take_words(codes, offsets, np.flatnonzero(~accepted))
+        in_lang = decode_words(self.alphabet, *in_lang_encoded)
+        not_in_lang = decode_words(self.alphabet, *not_in_lang_encoded)
+
+        if encoded:
+            return in_lang, not_in_lang, in_lang_encoded, not_in_lang_encoded
         return in_lang, not_in_lang
 
+    def write_random_sample(self, path, n=100, max_len=100, min_len=0, seed=None, batch_size=100000):
+        # the sample of get_random_sample written to a corpus file batch by batch, see WordCorpus.load
+        # only the hashes of the words are kept in memory
+        with CorpusWriter(path, self.alphabet, n) as writer:
+            for batch in self.random_batches(n, max_len, min_len, seed, batch_size):
+                writer.write(batch)
+
+    def random_batches(self, n, max_len, min_len, seed, batch_size):
+        # labelled corpora of new distinct words, n words in total
+        k = len(self.alphabet)
+        if n > sum(k**length for length in range(min_len, max_len + 1)):
+            raise Exception('There are fewer than ' + str(n) + ' words of lengths from ' + str(min_len) + ' to ' +
+                            str(max_len))
+        rng = np.random.default_rng(seed)
+        dtype = symbol_dtype(self.alphabet)
+        dfa = self.get_dfa()
+
+        hashes = SortedHashes()
+        count = 0
+        while count < n:
+            start = now()
+            # some more words than missing are drawn, as a part of them are duplicates
+            size = min(batch_size, 2*(n - count) + 16)
+            lengths = rng.integers(min_len, max_len + 1, size)
+            offsets = np.zeros(size + 1, dtype=np.intp)
+            np.cumsum(lengths, out=offsets[1:])
+            codes = rng.integers(0, k, offsets[-1], dtype=dtype)
+
+            # first occurrences of words not drawn before, in the order they were drawn
+            word_hashes = hash_words(codes, offsets)
+            _, first = np.unique(word_hashes, return_index=True)
+            first = np.sort(first)
+            first = first[~hashes.contains(word_hashes[first])][:n - count]
+            hashes.add(word_hashes[first])
+            count += len(first)
+
+            codes, offsets = take_words(codes, offsets, first)
+            batch = WordCorpus(self.alphabet, codes, offsets, dfa.accepts_many(codes, offsets))
+            self.record_generation(start, len(batch))
+            yield batch
+
+    def get_uniform_sample(self, n=100, in_language_percent=50, max_len=100, min_len=0, seed=None):
+        # distinct words drawn directly from the language and from its complement, without rejecting words of the
+        # wrong kind; a length is drawn uniformly from the lengths which still have words left, then a word is drawn
+        # uniformly from the words of that length
+        # if there are fewer words of a kind than requested, all of them are returned
+        # seed - int or random.Random, the same seed gives the same sample
+        start = now()
+        rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+        dfa = self.get_dfa()
+        in_lang_words = round(n*in_language_percent/100)
+
+        in_lang = get_uniform_words(dfa, in_lang_words, min_len, max_len, rng)
+        not_in_lang = get_uniform_words(dfa.complement(), n - in_lang_words, min_len, max_len, rng)
+
+        self.record_generation(start, len(in_lang) + len(not_in_lang))
+        return in_lang, not_in_lang
+
+    def record_generation(self, start, words):
+        if self.collector is not None:
+            self.collector.record(type(self).__name__, 'generation', now() - start, words=words)
+
+
+def get_uniform_words(dfa, n, min_len, max_len, rng=random):
+    counts = dfa.count_words(max_len)
+    available = {length: counts[length][dfa.start] for length in range(min_len, max_len + 1)
+                 if counts[length][dfa.start]}
+
+    # when most of the words are needed it is cheaper to list them all
+    if sum(available.values()) <= 2*n:
+        words = [w for length in available for w in dfa.all_words(length, counts)]
+        return rng.sample(words, min(n, len(words)))
+
+    words = []
+    seen = set()
+    lengths = list(available)
+    drawn = dict.fromkeys(lengths, 0)
+    while len(words) < n:
+        length = rng.choice(lengths)
+        w = dfa.sample(length, counts, rng)
+        if w not in seen:
+            words.append(w)
+            seen.add(w)
+            drawn[length] += 1
+            if drawn[length] == available[length]:
+                lengths.remove(length)
+    return words
+
+
+def hash_words(codes, offsets):
+    # 64-bit hash of every word: the sum of (code + 1) * HASH_BASE^position mixed with the length,
+    # distinct words collide with probability about 2^-64
+    lengths = np.diff(offsets)
+    positions = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    longest = lengths.max() if len(lengths) else 0
+    powers = np.cumprod(np.full(longest, HASH_BASE, dtype=np.uint64))
+    powers = np.concatenate([np.ones(1, dtype=np.uint64), powers])
+    terms = (codes.astype(np.uint64) + np.uint64(1)) * powers[positions]
+    sums = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(terms, dtype=np.uint64)])
+    return sums[offsets[1:]] - sums[offsets[:-1]] + lengths.astype(np.uint64) * np.uint64(HASH_LENGTH)
+
+
+class SortedHashes:
+    # set of hashes kept as sorted arrays of decreasing sizes, two arrays of similar sizes are merged,
+    # so adding a batch does not re-sort all hashes added before
+
+    def __init__(self):
+        self.runs = []
+
+    def contains(self, values):
+        found = np.zeros(len(values), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, values), len(run) - 1)
+            found |= run[positions] == values
+        return found
+
+    def add(self, values):
+        run = np.sort(values)
+        while self.runs and len(self.runs[-1]) <= 2*len(run):
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind='mergesort')
+        if len(run):
+            self.runs.append(run)
+
 
 def get_random_word(alphabet, length):
     w = random.sample(alphabet * length, length)
@@ -2,10 +2,10 @@ import numpy as np
 from typing import List
 from math import sqrt
 
-from QFA.GQFA import get_complementary_matrix, check_transition_matrices
+from QFA.GQFA import get_complementary_matrix, check_transition_matrices, fuse_measurement
 from QFA.Automaton import Automaton
-
-State = (np.ndarray, float, float)
+from QFA.Backend import to_backend
+from QFA.Kernel import DOUBLE, Kernel, MEASURE_MANY
 
 
 class MM_1QFA(Automaton):
@@ -15,7 +15,9 @@ class MM_1QFA(Automaton):
                  transition_matrices: List[np.ndarray],
                  projective_measurement_accept: np.ndarray,
                  projective_measurement_reject: np.ndarray,
-                 projective_measurement_non: np.ndarray = None
+                 projective_measurement_non: np.ndarray = None,
+                 backend: str = None,
+                 precision: str = DOUBLE
                  ):
         # list of chars
         self.alphabet = alphabet
@@ -24,52 +26,29 @@ class MM_1QFA(Automaton):
         # list of np matrices - position in list corresponds to position of letter in alphabet,
         # perhaps a map could be better
         # watch out in MM_1QFA - there needs to be a transition matrix for the end symbol
-        self.transition_matrices = check_transition_matrices(transition_matrices)
+        # backend - 'dense' or 'sparse' converts all matrices, by default they are kept as they are
+        self.transition_matrices = check_transition_matrices([to_backend(m, backend) for m in transition_matrices])
         # np matrix containing ones and zeroes
-        self.projective_measurement_accept = projective_measurement_accept
-        self.projective_measurement_reject = projective_measurement_reject
+        self.projective_measurement_accept = to_backend(projective_measurement_accept, backend)
+        self.projective_measurement_reject = to_backend(projective_measurement_reject, backend)
         if projective_measurement_non is not None:
-            self.projective_measurement_non = projective_measurement_non
+            self.projective_measurement_non = to_backend(projective_measurement_non, backend)
         else:
-            self.projective_measurement_non = get_complementary_matrix([projective_measurement_accept,
-                                                                        projective_measurement_reject])
-
-    def process(self, word: str) -> (float, float):
-
-        full_state = (self.initial_state, 0, 0)
-
-        for letter in word:
-            transition_matrix = self.transition_matrices[self.alphabet.index(letter)]
-
-            full_state = self.process_word(full_state, transition_matrix)
-
-        transition_matrix = self.transition_matrices[-1]
-        full_state = self.process_word(full_state, transition_matrix)
-
-        (continue_probability, acceptance_probability, rejection_probability) = full_state
-
-        error = abs(1 - acceptance_probability - rejection_probability)
-
-        return full_state[1], error
-
-    def process_word(self,
-                     total_state: State,
-                     transition_matrix: np.ndarray
-                     ) -> (State, np.ndarray, np.ndarray):
-
-        state = total_state[0]
-
-        new_state = self.projective_measurement_non @ transition_matrix @ state
-
-        acceptance_probability = total_state[1]
-        v = self.projective_measurement_accept @ transition_matrix @ state
-        acceptance_probability += np.vdot(v, v)
-
-        rejection_probability = total_state[2]
-        v = self.projective_measurement_reject @ transition_matrix @ state
-        rejection_probability += np.vdot(v, v)
-
-        return new_state, acceptance_probability, rejection_probability
+            self.projective_measurement_non = get_complementary_matrix([self.projective_measurement_accept,
+                                                                        self.projective_measurement_reject])
+        # precision - 'double' or 'single', in single precision states are float32 (complex64) and the error
+        #             of every result is at least the bound of its rounding errors, see Kernel.error_bounds
+        self.precision = precision
+
+    def build_kernel(self) -> Kernel:
+        # the same measurement is performed after every letter
+        projective_measurements = [self.projective_measurement_accept,
+                                   self.projective_measurement_reject,
+                                   self.projective_measurement_non]
+        return Kernel(MEASURE_MANY, self.alphabet, self.initial_state,
+                      [fuse_measurement(transition_matrix, projective_measurements)
+                       for transition_matrix in self.transition_matrices],
+                      end_symbol=len(self.transition_matrices) - 1, precision=self.precision)
 
 
 def example():
@@ -3,6 +3,8 @@ from typing import List
 from math import sqrt
 
 from QFA.Automaton import Automaton
+from QFA.Backend import to_backend
+from QFA.Kernel import DOUBLE, Kernel, MEASURE_ONCE
 from math import cos, sin, pi
 
 
@@ -11,28 +13,26 @@ class MO_1QFA(Automaton):
     def __init__(self, alphabet: str,
                  initial_state: np.ndarray,
                  transition_matrices: List[np.ndarray],
-                 projective_measurement: np.ndarray):
+                 projective_measurement: np.ndarray,
+                 backend: str = None,
+                 precision: str = DOUBLE):
         # list of chars
         self.alphabet = alphabet
         # np column vector, initial dist over states
         self.initial_state = initial_state
         # list of np matrices - position in list corresponds to position of letter in alphabet,
         # perhaps a map could be better
-        self.transition_matrices = transition_matrices
+        # backend - 'dense' or 'sparse' converts all matrices, by default they are kept as they are
+        self.transition_matrices = [to_backend(m, backend) for m in transition_matrices]
         # np matrix containing ones and zeroes
-        self.projective_measurement = projective_measurement
-
-    def process(self, word: str) -> (float, float):
-        acceptance_probability = self.initial_state
-        for letter in word:
-            transition_matrix = self.transition_matrices[self.alphabet.index(letter)]
-            acceptance_probability = transition_matrix @ acceptance_probability
-
-        acceptance_probability = self.projective_measurement @ acceptance_probability
-
-        acceptance_probability = np.vdot(acceptance_probability, acceptance_probability)  # vdot(a,a) = norm squared (a)
-
-        return acceptance_probability, 0
+        self.projective_measurement = to_backend(projective_measurement, backend)
+        # precision - 'double' or 'single', in single precision states are float32 (complex64) and the error
+        #             of every result is at least the bound of its rounding errors, see Kernel.error_bounds
+        self.precision = precision
+
+    def build_kernel(self) -> Kernel:
+        return Kernel(MEASURE_ONCE, self.alphabet, self.initial_state, self.transition_matrices,
+                      self.projective_measurement, precision=self.precision)
 
 
 def example():
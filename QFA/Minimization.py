@@ -0,0 +1,69 @@
+import numpy as np
+
+from QFA.Automaton import Automaton
+from QFA.Backend import to_dense
+from QFA.Equivalence import TOLERANCE, span
+from QFA.Kernel import LINEAR, MEASURE_ONCE
+from QFA.MO_1QFA import MO_1QFA
+from QFA.PFA import PFA
+
+# Equivalent automata of smaller dimension: the states are restricted to the subspace reachable from the initial state
+# and to the subspace the acceptance probability depends on, both found by QFA.Equivalence.span.
+# Every product costs O(n^2) per letter, so every later evaluation of a reduced automaton is cheaper.
+
+
+def minimize(automaton: Automaton, tolerance: float = TOLERANCE) -> Automaton:
+    # an automaton of the same class accepting every word with the same probability, up to tolerance
+    kind = automaton.compile().kind
+    if kind == LINEAR:
+        return minimize_pfa(automaton, tolerance)
+    elif kind == MEASURE_ONCE:
+        return minimize_mo_1qfa(automaton, tolerance)
+    raise Exception('Only PFA and MO_1QFA automata can be minimized')
+
+
+def minimize_pfa(pfa: PFA, tolerance: float = TOLERANCE) -> PFA:
+    # the representation of minimal dimension (Schützenberger's reduction), its matrices are not stochastic in general
+    # (entries can be negative), but every word is accepted with the same probability
+    kernel = pfa.compile()
+    # column vectors, as in the kernel
+    initial = kernel.initial_state
+    operators = [to_dense(operator) for operator in kernel.operators]
+    final = np.asarray(kernel.final)
+
+    # the states of all words lie in the reachable subspace
+    basis, _, _ = span(initial, operators, tolerance)
+    initial, operators, final = restricted(basis, initial, operators, final)
+    # the acceptance probability depends only on the part of the state in the observable subspace, spanned by
+    # final @ operators[w[-1]] @ ... @ operators[w[0]] for all words w
+    basis, _, _ = span(final.conj(), [operator.conj().T for operator in operators], tolerance)
+    initial, operators, final = restricted(basis, initial, operators, final)
+
+    return PFA(pfa.alphabet, initial[np.newaxis, :], [operator.T for operator in operators], final[:, np.newaxis])
+
+
+def minimize_mo_1qfa(mo_1qfa: MO_1QFA, tolerance: float = TOLERANCE) -> MO_1QFA:
+    # the transition matrices stay unitary and the measurement stays a projection
+    # the initial state is not normalized if a part of it is never measured
+    kernel = mo_1qfa.compile()
+    initial = kernel.initial_state
+    operators = [to_dense(operator) for operator in kernel.operators]
+    measurement = to_dense(kernel.final)
+
+    # the smallest subspace containing the rows of the measurement and closed under the inverses of the operators,
+    # as the operators are unitary the part of the state orthogonal to it stays orthogonal and is never measured
+    basis, _, _ = span(measurement.conj().T, [operator.conj().T for operator in operators], tolerance)
+    initial = basis @ (basis.conj().T @ initial)
+    # reachable from the initial state with the measurement among the operators, so that its restriction
+    # is still a projection
+    basis, _, _ = span(initial, operators + [measurement], tolerance)
+    initial, operators, measurement = restricted(basis, initial, operators, measurement)
+
+    return MO_1QFA(mo_1qfa.alphabet, initial[:, np.newaxis], operators, basis.conj().T @ measurement)
+
+
+def restricted(basis: np.ndarray, initial: np.ndarray, operators, final: np.ndarray):
+    # the representation in the coordinates of an orthonormal basis of a subspace closed under the operators
+    # (or under their conjugate transposes for the observable subspace)
+    adjoint = basis.conj().T
+    return adjoint @ initial, [adjoint @ operator @ basis for operator in operators], final @ basis
@@ -0,0 +1,136 @@
+import numpy as np
+
+# Operators of matrices with a structure recognised by structured(), applied to a vector or to a matrix of
+# column vectors with @ in O(n) (or O(sum of squared block sizes)) instead of O(n^2) per column:
+#   DiagonalOperator - diagonal matrices (phases), elementwise multiplication
+#   GatherOperator - at most one nonzero entry in every row: permutations, and in measure-many kernels permutations
+#                    fused with diagonal projections, which only zero some of the rows
+#   BlockDiagonalOperator - square matrices with several blocks on the diagonal (rotations of pairs of states),
+#                           consecutive blocks of the same size are applied together with one batched product
+# Other matrices are kept as they are.
+
+# smaller matrices are kept dense, for them a dense product is faster than indexing
+MIN_STRUCTURED_SIZE = 32
+
+
+class DiagonalOperator:
+    __slots__ = ('diagonal', 'shape', 'dtype')
+
+    def __init__(self, diagonal: np.ndarray):
+        self.diagonal = diagonal
+        self.shape = (len(diagonal), len(diagonal))
+        self.dtype = diagonal.dtype
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        if other.ndim == 1:
+            return self.diagonal * other
+        return self.diagonal[:, np.newaxis] * other
+
+    def toarray(self) -> np.ndarray:
+        return np.diag(self.diagonal)
+
+
+class GatherOperator:
+    __slots__ = ('index', 'values', 'shape', 'dtype')
+
+    def __init__(self, index: np.ndarray, values: np.ndarray, shape: (int, int), dtype):
+        # row i of the product is values[i] * other[index[i]], values is None if all of them are 1
+        self.index = index
+        self.values = values
+        self.shape = shape
+        self.dtype = dtype
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        rows = other[self.index]
+        if self.values is None:
+            return rows
+        if other.ndim == 1:
+            return self.values * rows
+        return self.values[:, np.newaxis] * rows
+
+    def toarray(self) -> np.ndarray:
+        matrix = np.zeros(self.shape, dtype=self.dtype)
+        matrix[np.arange(self.shape[0]), self.index] = 1 if self.values is None else self.values
+        return matrix
+
+
+class BlockDiagonalOperator:
+    __slots__ = ('groups', 'shape', 'dtype')
+
+    def __init__(self, groups: list, shape: (int, int), dtype):
+        # groups - (start, blocks) for every run of consecutive blocks of the same size b: blocks[k] is the b x b
+        #          matrix of rows and columns start + k * b to start + (k + 1) * b - 1
+        self.groups = groups
+        self.shape = shape
+        self.dtype = dtype
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        product = np.empty(other.shape, dtype=np.result_type(self.dtype, other.dtype))
+        columns = other.shape[1] if other.ndim == 2 else 1
+        for start, blocks in self.groups:
+            count, size, _ = blocks.shape
+            stop = start + count * size
+            block_product = np.matmul(blocks, other[start:stop].reshape(count, size, columns))
+            product[start:stop] = block_product.reshape(product[start:stop].shape)
+        return product
+
+    def toarray(self) -> np.ndarray:
+        matrix = np.zeros(self.shape, dtype=self.dtype)
+        for start, blocks in self.groups:
+            for block in blocks:
+                matrix[start:start + len(block), start:start + len(block)] = block
+                start += len(block)
+        return matrix
+
+
+def structured(matrix: np.ndarray, min_size: int = MIN_STRUCTURED_SIZE):
+    # an operator of the structure of the dense matrix, or the matrix itself
+    rows, columns = matrix.shape
+    if min(rows, columns) < min_size:
+        return matrix
+    nonzero = matrix != 0
+    counts = nonzero.sum(axis=1)
+
+    if rows == columns and counts.sum() == np.count_nonzero(np.diagonal(nonzero)):
+        return DiagonalOperator(np.ascontiguousarray(np.diagonal(matrix)))
+
+    if np.all(counts <= 1):
+        index = np.argmax(nonzero, axis=1)
+        values = matrix[np.arange(rows), index]
+        if np.all(values == 1):
+            values = None
+        return GatherOperator(index, values, matrix.shape, matrix.dtype)
+
+    if rows == columns:
+        sizes = block_sizes(nonzero)
+        # worth it if the blocks have at most a quarter of the entries of the matrix
+        if len(sizes) > 1 and np.sum(sizes ** 2) <= rows * rows // 4:
+            return block_diagonal(matrix, sizes)
+    return matrix
+
+
+def block_sizes(nonzero: np.ndarray) -> np.ndarray:
+    # sizes of the finest partition of the matrix into consecutive diagonal blocks with no nonzero entries outside
+    n = nonzero.shape[0]
+    positions = np.arange(n)
+    # the last column with a nonzero entry in every row and the last row with a nonzero entry in every column
+    last_in_rows = np.where(nonzero.any(axis=1), n - 1 - np.argmax(nonzero[:, ::-1], axis=1), positions)
+    last_in_columns = np.where(nonzero.any(axis=0), n - 1 - np.argmax(nonzero[::-1, :], axis=0), positions)
+    # a block ends at i if nothing before i reaches past it
+    reach = np.maximum.accumulate(np.maximum(np.maximum(last_in_rows, last_in_columns), positions))
+    ends = np.flatnonzero(reach == positions)
+    return np.diff(np.concatenate([[-1], ends]))
+
+
+def block_diagonal(matrix: np.ndarray, sizes: np.ndarray) -> BlockDiagonalOperator:
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    # runs of consecutive blocks of the same size
+    run_starts = np.flatnonzero(np.diff(np.concatenate([[0], sizes])) != 0)
+    run_stops = np.append(run_starts[1:], len(sizes))
+    groups = []
+    for first, last in zip(run_starts, run_stops):
+        size = sizes[first]
+        rows = starts[first:last, np.newaxis] + np.arange(size)
+        blocks = matrix[rows[:, :, np.newaxis], rows[:, np.newaxis, :]]
+        groups.append((int(starts[first]), np.ascontiguousarray(blocks)))
+    return BlockDiagonalOperator(groups, matrix.shape, matrix.dtype)
@@ -2,13 +2,17 @@ import numpy as np
 from typing import List
 
 from QFA.Automaton import Automaton
+from QFA.Backend import to_backend, to_dense
+from QFA.Kernel import DOUBLE, Kernel, LINEAR
 
 
 class PFA(Automaton):
     def __init__(self, alphabet: str,
                  initial_state: np.ndarray,
                  transition_matrices: List[np.ndarray],
-                 acceptance_vector: np.ndarray):
+                 acceptance_vector: np.ndarray,
+                 backend: str = None,
+                 precision: str = DOUBLE):
 
         # list of chars
         self.alphabet = alphabet
@@ -16,18 +20,18 @@ class PFA(Automaton):
         self.initial_state = initial_state
         # list of np matrices - position in list corresponds to position of letter in alphabet,
         # perhaps a map could be better
-        self.transition_matrices = transition_matrices
+        # backend - 'dense' or 'sparse' converts all matrices, by default they are kept as they are
+        self.transition_matrices = [to_backend(m, backend) for m in transition_matrices]
         # np column vector of ones and zeroes
         self.acceptance_vector = acceptance_vector
+        # precision - 'double' or 'single', in single precision states are float32 (complex64) and the error
+        #             of every result is at least the bound of its rounding errors, see Kernel.error_bounds
+        self.precision = precision
 
-    def process(self, word: str) -> (float, float):
-        acceptance_probability = self.initial_state
-        for letter in word:
-            transition_matrix = self.transition_matrices[self.alphabet.index(letter)]
-            acceptance_probability = acceptance_probability @ transition_matrix
-        acceptance_probability = acceptance_probability @ self.acceptance_vector
-        acceptance_probability = acceptance_probability[0][0]
-        return acceptance_probability, 0
+    def build_kernel(self) -> Kernel:
+        # the kernel uses column vectors, so the matrices are transposed
+        return Kernel(LINEAR, self.alphabet, self.initial_state.T, [m.T for m in self.transition_matrices],
+                      np.ravel(to_dense(self.acceptance_vector)), precision=self.precision)
 
 
 def example():
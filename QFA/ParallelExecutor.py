@@ -0,0 +1,158 @@
+import os
+import uuid
+import numpy as np
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import List
+
+from QFA.Automaton import Automaton
+from QFA.Kernel import Kernel
+from QFA.WordCorpus import WordCorpus
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # python < 3.8, the kernel is pickled with every task instead
+    shared_memory = None
+
+# workers are threads of this process, numpy releases the GIL during matrix products
+THREAD = 'thread'
+# workers are separate processes, the kernel's arrays are shared with them through shared memory
+PROCESS = 'process'
+
+# description of an array placed in a shared memory block
+SharedArray = namedtuple('SharedArray', ['name', 'shape', 'dtype'])
+
+
+class ParallelExecutor:
+    # the pool of workers and the shared copy of the kernel are created on first use and kept between calls of run,
+    # so chunks of a stream are evaluated without starting the workers and copying the kernel again;
+    # close() (or leaving a with block) stops the workers and frees the shared memory
+
+    def __init__(self,
+                 kind: str = PROCESS,
+                 workers: int = None,
+                 chunk_size: int = 10000):
+        if kind not in (THREAD, PROCESS):
+            raise Exception('Unknown executor kind: ' + str(kind))
+        self.kind = kind
+        # defaults to the number of cores
+        self.workers = workers or os.cpu_count() or 1
+        # number of words evaluated by a worker in one task
+        self.chunk_size = chunk_size
+        self.pool = None
+        # the kernel last evaluated and, for processes, its copy in shared memory
+        self.kernel = None
+        self.shared_kernel = None
+
+    def __enter__(self) -> 'ParallelExecutor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def run(self, automaton: Automaton, words: List[str], mode: str = 'batch') -> (np.ndarray, np.ndarray):
+        # evaluates the words in chunks on all workers, results are returned in the order of the words
+        # mode - 'batch' or 'trie', as in LanguageChecker
+        # words - list of strings or a WordCorpus, whose chunks are views of it
+        kernel = automaton.compile()
+        chunks = [words[i:i + self.chunk_size] for i in range(0, len(words), self.chunk_size)]
+        if not chunks:
+            return np.zeros(0), np.zeros(0)
+
+        if self.pool is None:
+            pool_class = ThreadPoolExecutor if self.kind == THREAD else ProcessPoolExecutor
+            self.pool = pool_class(self.workers)
+        if self.kind == THREAD:
+            results = list(self.pool.map(partial(run_chunk, kernel, mode), chunks))
+        else:
+            if kernel is not self.kernel:
+                # the automaton changed or another one is evaluated, the previous copy is no longer used
+                self.close_kernel()
+                self.shared_kernel = SharedKernel(kernel)
+            # every task carries the small description of the shared kernel, a worker attaches to it once
+            description = self.shared_kernel.description
+            results = list(self.pool.map(run_in_worker, chunks, [mode] * len(chunks),
+                                         [self.shared_kernel.token] * len(chunks), [description] * len(chunks)))
+        self.kernel = kernel
+
+        probabilities = np.concatenate([p for (p, e) in results])
+        errors = np.concatenate([e for (p, e) in results])
+        return probabilities, errors
+
+    def close_kernel(self):
+        if self.shared_kernel is not None:
+            self.shared_kernel.close()
+            self.shared_kernel = None
+        self.kernel = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        self.close_kernel()
+
+
+def run_chunk(kernel: Kernel, mode: str, words: List[str]) -> (np.ndarray, np.ndarray):
+    if isinstance(words, WordCorpus):
+        if mode == 'trie':
+            return kernel.run_trie(words.words())
+        codes, offsets = words.encoded()
+        return kernel.run_many(kernel.recode(words.alphabet, codes), offsets)
+    if mode == 'trie':
+        return kernel.run_trie(words)
+    codes, offsets = kernel.encode_many(words)
+    return kernel.run_many(codes, offsets)
+
+
+class SharedKernel:
+    # copies the dense arrays of a kernel to shared memory blocks, which the workers map instead of receiving copies
+    # fields which are not dense arrays (e.g. sparse operators) are pickled with the description
+
+    def __init__(self, kernel: Kernel):
+        # identifies the copy in the workers, which keep the kernel they attached to last
+        self.token = uuid.uuid4().hex
+        self.blocks = []
+        self.description = {}
+        for name, value in kernel.fields().items():
+            if shared_memory is not None and isinstance(value, np.ndarray) and value.nbytes > 0:
+                block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+                np.ndarray(value.shape, value.dtype, buffer=block.buf)[...] = value
+                self.blocks.append(block)
+                value = SharedArray(block.name, value.shape, value.dtype.str)
+            self.description[name] = value
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# state of a worker process: the kernel, its token and the shared memory blocks its arrays live in
+worker = {}
+
+
+def attach_kernel(token: str, description: dict):
+    # the arrays of the previous kernel are views of its blocks, they are released before the blocks are closed
+    worker.pop('kernel', None)
+    for block in worker.get('blocks', []):
+        block.close()
+    blocks = []
+    fields = {}
+    for name, value in description.items():
+        if isinstance(value, SharedArray):
+            block = shared_memory.SharedMemory(name=value.name)
+            blocks.append(block)
+            value = np.ndarray(value.shape, np.dtype(value.dtype), buffer=block.buf)
+        fields[name] = value
+    worker['blocks'] = blocks
+    worker['kernel'] = Kernel.restore(fields)
+    worker['token'] = token
+
+
+def run_in_worker(words: List[str], mode: str, token: str, description: dict) -> (np.ndarray, np.ndarray):
+    if worker.get('token') != token:
+        attach_kernel(token, description)
+    return run_chunk(worker['kernel'], mode, words)
@@ -1,5 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 from QFA.LanguageChecker import LanguageChecker
 
@@ -8,12 +10,28 @@ class Plotter:
     def __init__(self, language_checker: LanguageChecker):
         self.language_checker = language_checker
 
+    @staticmethod
+    def from_results(path: str) -> 'Plotter':
+        # plots results saved by LanguageChecker.save_results, without the automaton and the words
+        language_checker = LanguageChecker(None, [], [])
+        language_checker.load_results(path)
+        return Plotter(language_checker)
+
     def plot(self):
-        if not self.language_checker.lang_results:
+        if self.language_checker.statistics is None:
             self.language_checker.check_language()
+        statistics = self.language_checker.statistics
+
+        # check_stream and check_exhaustive keep only the counts of the histograms, not the results of the words
+        if len(self.language_checker.lang_probabilities) != statistics.lang_count or \
+                len(self.language_checker.not_lang_probabilities) != statistics.not_lang_count:
+            draw_histograms(plt.gca(), statistics)
+            draw_conditions(plt.gca(), self.language_checker.accepted)
+            plt.show()
+            return
 
-        probabilities_in_lang = [e[0] for e in self.language_checker.lang_results]
-        probabilities_not_in_lang = [e[0] for e in self.language_checker.not_lang_results]
+        probabilities_in_lang = self.language_checker.lang_probabilities
+        probabilities_not_in_lang = self.language_checker.not_lang_probabilities
 
         try:
             if len(probabilities_not_in_lang) > 100:
@@ -34,38 +52,73 @@ class Plotter:
             n, bins, patches = plt.hist(probabilities_in_lang, bins=np.linspace(0, 1, 100), range=(0, 1), alpha=0.5,
                                         label='Words in language', color='green', edgecolor='black')
 
-        min_ylim, max_ylim = plt.ylim()
-
-        if 'isolated_cutpoint' in self.language_checker.accepted:
-            ctp = self.language_checker.accepted['isolated_cutpoint'][0]
-            eps = self.language_checker.accepted['isolated_cutpoint'][1]
-            plt.axvline(ctp, color='k')
-            plt.text(ctp, max_ylim * 1.01, 'Cutpoint: {:.2f}'.format(ctp), horizontalalignment='center', rotation=60)
-            plt.axvline(ctp + eps, color='k', linestyle='dashed')
-            plt.text(ctp + eps, max_ylim * 1.01, 'Cutpoint+$\epsilon$: {:.2f}'.format(ctp + eps),
-                     horizontalalignment='center', rotation=60)
-            plt.axvline(ctp - eps, color='k', linestyle='dashed')
-            plt.text(ctp - eps, max_ylim * 1.01, 'Cutpoint-$\epsilon$: {:.2f}'.format(ctp - eps),
-                     horizontalalignment='center', rotation=60)
-        elif 'cutpoint' in self.language_checker.accepted:
-            ctp = self.language_checker.accepted['cutpoint']
-            plt.axvline(ctp, color='k')
-            plt.text(ctp, max_ylim * 1.01, 'Cutpoint: {:.2f}'.format(ctp), horizontalalignment='center', rotation=60)
-        if 'Monte_Carlo' in self.language_checker.accepted:
-            eps = self.language_checker.accepted['Monte_Carlo']
-            plt.axvline(1 / 2 + eps, color='k', linestyle='dashed')
-            plt.text(1 / 2 + eps, max_ylim * 1.01, 'Monte Carlo boundary: {:.2f}'.format(1 / 2 + eps),
-                     horizontalalignment='center', rotation=60)
-            plt.axvline(1 / 2 - eps, color='k', linestyle='dashed')
-            plt.text(1 / 2 - eps, max_ylim * 1.01, 'Monte Carlo boundary: {:.2f}'.format(1 / 2 - eps),
-                     horizontalalignment='center', rotation=60)
-
-        plt.ylabel('Word count')
-        plt.xlabel('Acceptance probability')
-
-        plt.legend()
+        draw_conditions(plt.gca(), self.language_checker.accepted)
         plt.show()
 
+    def save_histogram(self, path: str, chunk_size: int = 10000, bins: int = None):
+        # renders the histogram counts kept by the checker's statistics to an image file with the Agg backend,
+        # no display is needed and memory does not depend on the number of words
+        # if the checker was not run, its words are checked with check_stream in bins bins (100 by default),
+        # so no results are kept either; otherwise the bins of the statistics are used and bins must match them
+        statistics = self.language_checker.statistics
+        if statistics is None:
+            self.language_checker.check_stream(chunk_size=chunk_size, bins=bins or 100)
+            statistics = self.language_checker.statistics
+        elif bins is not None and bins != statistics.bins:
+            raise Exception('The statistics of the checker have ' + str(statistics.bins) + ' bins, not ' + str(bins))
+
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot(1, 1, 1)
+        draw_histograms(axes, statistics)
+        draw_conditions(axes, self.language_checker.accepted)
+        # the rotated labels of the boundaries are above the axes
+        figure.savefig(path, bbox_inches='tight')
+
+
+def draw_histograms(axes, statistics):
+    # the histogram counts of the statistics drawn as bars, plt.stairs is not available in every supported matplotlib
+    edges = np.linspace(0, 1, statistics.bins + 1)
+    axes.bar(edges[:-1], statistics.not_lang_histogram, width=np.diff(edges), align='edge', alpha=0.5,
+             label='Words not in language', color='red', edgecolor='black')
+    axes.bar(edges[:-1], statistics.lang_histogram, width=np.diff(edges), align='edge', alpha=0.5,
+             label='Words in language', color='green', edgecolor='black')
+    axes.set_xlim(0, 1)
+
+
+def draw_conditions(axes, accepted: dict):
+    # cutpoints and Monte Carlo boundaries of the accepted conditions, axis labels and the legend
+    min_ylim, max_ylim = axes.get_ylim()
+
+    if 'isolated_cutpoint' in accepted:
+        ctp = accepted['isolated_cutpoint'][0]
+        eps = accepted['isolated_cutpoint'][1]
+        axes.axvline(ctp, color='k')
+        axes.text(ctp, max_ylim * 1.01, 'Cutpoint: {:.2f}'.format(ctp), horizontalalignment='center', rotation=60)
+        axes.axvline(ctp + eps, color='k', linestyle='dashed')
+        axes.text(ctp + eps, max_ylim * 1.01, r'Cutpoint+$\epsilon$: {:.2f}'.format(ctp + eps),
+                  horizontalalignment='center', rotation=60)
+        axes.axvline(ctp - eps, color='k', linestyle='dashed')
+        axes.text(ctp - eps, max_ylim * 1.01, r'Cutpoint-$\epsilon$: {:.2f}'.format(ctp - eps),
+                  horizontalalignment='center', rotation=60)
+    elif 'cutpoint' in accepted:
+        ctp = accepted['cutpoint']
+        axes.axvline(ctp, color='k')
+        axes.text(ctp, max_ylim * 1.01, 'Cutpoint: {:.2f}'.format(ctp), horizontalalignment='center', rotation=60)
+    if 'Monte_Carlo' in accepted:
+        eps = accepted['Monte_Carlo']
+        axes.axvline(1 / 2 + eps, color='k', linestyle='dashed')
+        axes.text(1 / 2 + eps, max_ylim * 1.01, 'Monte Carlo boundary: {:.2f}'.format(1 / 2 + eps),
+                  horizontalalignment='center', rotation=60)
+        axes.axvline(1 / 2 - eps, color='k', linestyle='dashed')
+        axes.text(1 / 2 - eps, max_ylim * 1.01, 'Monte Carlo boundary: {:.2f}'.format(1 / 2 - eps),
+                  horizontalalignment='center', rotation=60)
+
+    axes.set_ylabel('Word count')
+    axes.set_xlabel('Acceptance probability')
+
+    axes.legend()
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,216 @@
+import numpy as np
+
+# partitions a witness word can come from, as in LanguageChecker.language and LanguageChecker.not_in_language
+LANGUAGE = 'language'
+NOT_IN_LANGUAGE = 'not_in_language'
+
+
+class ResultStatistics:
+    # Running aggregates of the (probability, error) results of words in and out of the language.
+    # They are enough to decide every acceptance condition checked by LanguageChecker, so the results
+    # themselves do not have to be kept - memory does not depend on the number of words.
+    # Every aggregate remembers the index of the word it comes from (counted in the order of updates),
+    # so a word refuting a condition can be reported.
+
+    def __init__(self, bins: int = 100):
+        # words in the language
+        self.lang_count = 0
+        # the lowest acceptance probability and its error, error is None until a probability below 1 is seen
+        self.lang_min = 1
+        self.lang_min_error = None
+        self.lang_min_index = None
+        # the highest 1 - p - e (bounded error)
+        self.lang_max_shortfall = 0
+        self.lang_max_shortfall_index = None
+        # number of words with p outside of [1 - e, 1 + e] (Monte Carlo, negative unbounded) and the first of them
+        self.lang_not_one = 0
+        self.lang_not_one_index = None
+        # number of words with -e < p < e (positive unbounded) and the first of them
+        self.lang_zero = 0
+        self.lang_zero_index = None
+
+        # words not in the language
+        self.not_lang_count = 0
+        # the highest acceptance probability and its error, error is None until a probability above 0 is seen
+        self.not_lang_max = 0
+        self.not_lang_max_error = None
+        self.not_lang_max_index = None
+        # the highest p - e (cutpoint)
+        self.not_lang_max_lower = -np.inf
+        self.not_lang_max_lower_index = None
+        # the highest p + e (bounded error)
+        self.not_lang_max_upper = 0
+        self.not_lang_max_upper_index = None
+
+        # histograms of acceptance probabilities, bins of equal width over [0, 1]
+        self.bins = bins
+        self.lang_histogram = np.zeros(bins, dtype=np.int64)
+        self.not_lang_histogram = np.zeros(bins, dtype=np.int64)
+
+    def update(self, in_language: bool, probabilities: np.ndarray, errors: np.ndarray):
+        probabilities = np.asarray(probabilities, dtype=float)
+        errors = np.asarray(errors, dtype=float)
+        if len(probabilities) == 0:
+            return
+
+        histogram, _ = np.histogram(np.clip(probabilities, 0, 1), bins=self.bins, range=(0, 1))
+
+        if in_language:
+            offset = self.lang_count
+            self.lang_count += len(probabilities)
+
+            i = np.argmin(probabilities)
+            if probabilities[i] < self.lang_min:
+                self.lang_min = probabilities[i]
+                self.lang_min_error = errors[i]
+                self.lang_min_index = int(offset + i)
+
+            shortfalls = 1 - probabilities - errors
+            i = np.argmax(shortfalls)
+            if shortfalls[i] > self.lang_max_shortfall:
+                self.lang_max_shortfall = shortfalls[i]
+                self.lang_max_shortfall_index = int(offset + i)
+
+            not_one = np.flatnonzero((probabilities < 1 - errors) | (probabilities > 1 + errors))
+            if len(not_one) and not self.lang_not_one:
+                self.lang_not_one_index = int(offset + not_one[0])
+            self.lang_not_one += len(not_one)
+
+            zero = np.flatnonzero((-errors < probabilities) & (probabilities < errors))
+            if len(zero) and not self.lang_zero:
+                self.lang_zero_index = int(offset + zero[0])
+            self.lang_zero += len(zero)
+
+            self.lang_histogram += histogram
+        else:
+            offset = self.not_lang_count
+            self.not_lang_count += len(probabilities)
+
+            i = np.argmax(probabilities)
+            if probabilities[i] > self.not_lang_max:
+                self.not_lang_max = probabilities[i]
+                self.not_lang_max_error = errors[i]
+                self.not_lang_max_index = int(offset + i)
+
+            lower = probabilities - errors
+            i = np.argmax(lower)
+            if lower[i] > self.not_lang_max_lower:
+                self.not_lang_max_lower = lower[i]
+                self.not_lang_max_lower_index = int(offset + i)
+
+            upper = probabilities + errors
+            i = np.argmax(upper)
+            if upper[i] > self.not_lang_max_upper:
+                self.not_lang_max_upper = upper[i]
+                self.not_lang_max_upper_index = int(offset + i)
+
+            self.not_lang_histogram += histogram
+
+    def cutpoint(self):
+        if not self.lang_count:
+            raise Exception("Cannot calculate cutpoint because there are no words in the language")
+        err = self.lang_min_error or 0.0
+        # a word not in the language is accepted above the cutpoint
+        if self.not_lang_max_lower > self.lang_min + err:
+            return False
+        return self.lang_min
+
+    def isolated_cutpoint(self):
+        error = max(self.lang_min_error or 0.0, self.not_lang_max_error or 0.0)
+        cutpoint = (self.lang_min + self.not_lang_max) / 2
+        epsilon = cutpoint - self.not_lang_max
+
+        if self.not_lang_max > cutpoint + error:
+            return False
+        else:
+            return cutpoint, epsilon, error
+
+    def monte_carlo(self):
+        if self.lang_not_one:
+            return False
+        epsilon = self.not_lang_max
+        if epsilon >= 1/2 - (self.not_lang_max_error or 0.0):
+            return False
+        return epsilon
+
+    def bounded_error(self):
+        # the largest 1 - p - e of the words in the language and p + e of the words not in it, which does not
+        # depend on the order of the words; the earlier per-word loop of LanguageChecker only raised epsilon when a word
+        # exceeded it by more than its error, so it could be smaller (e.g. 0.3 instead of 0.34 for the results
+        # 0.3 and then 0.29 with error 0.05)
+        epsilon = max(0, self.lang_max_shortfall, self.not_lang_max_upper)
+        if epsilon >= 1/2:
+            return False
+        return epsilon
+
+    def positive_unbounded(self):
+        return self.lang_zero == 0
+
+    def negative_unbounded(self):
+        return self.lang_not_one == 0
+
+    def witnesses(self) -> dict:
+        # for every refuted condition: (LANGUAGE or NOT_IN_LANGUAGE, index of a word refuting it)
+        witnesses = {}
+
+        if self.lang_count and self.cutpoint() is False:
+            witnesses['cutpoint'] = (NOT_IN_LANGUAGE, self.not_lang_max_lower_index)
+
+        if self.isolated_cutpoint() is False:
+            witnesses['isolated_cutpoint'] = (NOT_IN_LANGUAGE, self.not_lang_max_index)
+
+        if self.monte_carlo() is False:
+            if self.lang_not_one:
+                witnesses['Monte_Carlo'] = (LANGUAGE, self.lang_not_one_index)
+            else:
+                witnesses['Monte_Carlo'] = (NOT_IN_LANGUAGE, self.not_lang_max_index)
+
+        if self.bounded_error() is False:
+            if self.lang_max_shortfall >= self.not_lang_max_upper:
+                witnesses['bounded'] = (LANGUAGE, self.lang_max_shortfall_index)
+            else:
+                witnesses['bounded'] = (NOT_IN_LANGUAGE, self.not_lang_max_upper_index)
+
+        if not self.positive_unbounded():
+            witnesses['positive_unbounded'] = (LANGUAGE, self.lang_zero_index)
+
+        if not self.negative_unbounded():
+            witnesses['negative_unbounded'] = (LANGUAGE, self.lang_not_one_index)
+
+        return witnesses
+
+    def indices(self) -> set:
+        # (LANGUAGE or NOT_IN_LANGUAGE, index) of every word an aggregate comes from, the witnesses are among them
+        indices = {(LANGUAGE, index) for index in (self.lang_min_index, self.lang_max_shortfall_index,
+                                                   self.lang_not_one_index, self.lang_zero_index)}
+        indices |= {(NOT_IN_LANGUAGE, index) for index in (self.not_lang_max_index, self.not_lang_max_lower_index,
+                                                           self.not_lang_max_upper_index)}
+        return {(partition, index) for partition, index in indices if index is not None}
+
+    def accepted(self) -> dict:
+        # the same dictionary as LanguageChecker.check_language returns
+        accepted = {}
+
+        cutpoint = self.cutpoint()
+        if cutpoint:
+            accepted['cutpoint'] = cutpoint
+
+        isolated_cutpoint = self.isolated_cutpoint()
+        if isolated_cutpoint:
+            accepted['isolated_cutpoint'] = isolated_cutpoint
+
+        monte_carlo_eps = self.monte_carlo()
+        if monte_carlo_eps:
+            accepted['Monte_Carlo'] = monte_carlo_eps
+
+        bounded_err = self.bounded_error()
+        if bounded_err:
+            accepted['bounded'] = bounded_err
+
+        if self.positive_unbounded():
+            accepted['positive_unbounded'] = True
+
+        if self.negative_unbounded():
+            accepted['negative_unbounded'] = True
+
+        return accepted
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import importlib
+import json
+import numpy as np
+from typing import Dict, List
+
+from QFA.Automaton import Automaton
+
+# Evaluation service: named automata evaluated for clients connected over TCP, run with:
+#   python -m QFA.Service name=module:function [name=module:function ...] [--port 8765]
+# where module.function() returns the automaton, e.g. mo=QFA.MO_1QFA:mo_1qfa_example_4
+#
+# Protocol: one JSON object per line in both directions
+#   request:  {"id": 1, "automaton": "mo", "words": ["a", "aaa"]}
+#   response: {"id": 1, "probabilities": [0.25, 1.0], "errors": [0, 0]}
+#         or: {"id": 1, "error": "Unknown automaton: mo"}
+# the id is optional and copied to the response, requests of one connection can be answered out of order.
+#
+# Requests for the same automaton arriving within max_latency seconds of each other are evaluated together
+# by one Automaton.process_many call of at most about max_batch_size words, in a thread, so the event loop
+# keeps accepting requests while a batch is evaluated.
+
+MAX_BATCH_SIZE = 4096
+MAX_LATENCY = 0.002
+
+
+class EvaluationService:
+
+    def __init__(self,
+                 automata: Dict[str, Automaton],
+                 max_batch_size: int = MAX_BATCH_SIZE,
+                 max_latency: float = MAX_LATENCY):
+        self.automata = automata
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        # kernels are compiled here, so the threads evaluating the batches only read them
+        for automaton in automata.values():
+            automaton.compile()
+        # pending (words, future) pairs of every automaton and the tasks evaluating them
+        self.queues = {}
+        self.batchers = []
+        self.server = None
+        # numbers of requests, words and evaluated batches
+        self.stats = {'requests': 0, 'words': 0, 'batches': 0}
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> (str, int):
+        # listens on the address, port 0 picks a free port, returns the address
+        for name in self.automata:
+            self.queues[name] = asyncio.Queue()
+            self.batchers.append(asyncio.ensure_future(self.run_batches(name)))
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for batcher in self.batchers:
+            batcher.cancel()
+        await asyncio.gather(*self.batchers, return_exceptions=True)
+        self.batchers = []
+
+    async def evaluate(self, name: str, words: List[str]) -> (np.ndarray, np.ndarray):
+        # (probabilities, errors) of the words, evaluated in a batch with the words of other requests
+        if name not in self.automata:
+            raise Exception('Unknown automaton: ' + str(name))
+        alphabet = self.automata[name].alphabet
+        if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+            raise Exception('Words must be a list of strings')
+        # checked here, so a wrong word fails only its own request and not the whole batch
+        if not set(''.join(words)) <= set(alphabet):
+            raise Exception('Words contain letters which are not in the alphabet')
+
+        self.stats['requests'] += 1
+        self.stats['words'] += len(words)
+        future = asyncio.get_running_loop().create_future()
+        await self.queues[name].put((words, future))
+        return await future
+
+    async def run_batches(self, name: str):
+        loop = asyncio.get_running_loop()
+        automaton = self.automata[name]
+        queue = self.queues[name]
+        while True:
+            batch = [await queue.get()]
+            count = len(batch[0][0])
+            deadline = loop.time() + self.max_latency
+            while count < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                count += len(batch[-1][0])
+
+            words = [word for request_words, _ in batch for word in request_words]
+            try:
+                probabilities, errors = await loop.run_in_executor(None, automaton.process_many, words)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.stats['batches'] += 1
+
+            start = 0
+            for request_words, future in batch:
+                stop = start + len(request_words)
+                # the future of a cancelled request is already done
+                if not future.done():
+                    future.set_result((probabilities[start:stop], errors[start:stop]))
+                start = stop
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # every request is answered by its own task, so a client can send many requests without waiting
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def respond(self, line: bytes, writer: asyncio.StreamWriter):
+        response = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise Exception('A request must be a JSON object')
+            if 'id' in request:
+                response['id'] = request['id']
+            probabilities, errors = await self.evaluate(request.get('automaton'), request.get('words'))
+            response['probabilities'] = probabilities.tolist()
+            response['errors'] = np.asarray(errors, dtype=float).tolist()
+        except Exception as error:
+            response['error'] = str(error)
+        writer.write(json.dumps(response).encode('utf-8') + b'\n')
+        await writer.drain()
+
+
+def load_automaton(specification: str) -> Automaton:
+    # 'module:function', the automaton returned by the function
+    module, function = specification.split(':')
+    return getattr(importlib.import_module(module), function)()
+
+
+async def serve(automata: Dict[str, Automaton], host: str, port: int, max_batch_size: int, max_latency: float):
+    service = EvaluationService(automata, max_batch_size, max_latency)
+    host, port = await service.start(host, port)
+    print('Serving ' + ', '.join(automata) + ' on ' + host + ':' + str(port), flush=True)
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(arguments: List[str] = None):
+    parser = argparse.ArgumentParser(description='Evaluates words on named automata for clients connected over TCP.')
+    parser.add_argument('automata', nargs='+', help='name=module:function, the function returns the automaton')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--max-latency', type=float, default=MAX_LATENCY,
+                        help='seconds a request can wait for others to be evaluated with')
+    arguments = parser.parse_args(arguments)
+
+    automata = {}
+    for specification in arguments.automata:
+        name, _, function = specification.partition('=')
+        automata[name] = load_automaton(function)
+    asyncio.run(serve(automata, arguments.host, arguments.port, arguments.max_batch_size, arguments.max_latency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+import struct
+import numpy as np
+from typing import List
+
+# Corpus file layout, all numbers little-endian:
+#   header: magic, symbol size in bytes (1 or 2), 1 if the words are labelled, number of words,
+#           length of the utf-8 encoded alphabet
+#   alphabet, padded with zeros to a multiple of 8 bytes
+#   offsets: number of words + 1 int64
+#   labels: one byte per word if labelled, padded to a multiple of 8 bytes
+#   symbols: up to the end of the file
+# Symbols are placed last, so a file can be written in chunks when only the number of words is known in advance.
+MAGIC = b'QFAWORDS'
+HEADER = struct.Struct('<8sIIQQ')
+
+
+class WordCorpus:
+    # Words stored without python strings: positions of their letters in the alphabet in one contiguous buffer,
+    # in the layout of Kernel.encode_many - word i is symbols[offsets[i]:offsets[i + 1]].
+    # A letter takes one byte (two for alphabets longer than 256 letters) and a word 8 bytes of its offset.
+    # Slices with step 1 are views sharing the buffers of the corpus they are taken from.
+
+    def __init__(self,
+                 alphabet: str,
+                 symbols: np.ndarray,
+                 offsets: np.ndarray,
+                 labels: np.ndarray = None):
+        self.alphabet = alphabet
+        self.symbols = symbols
+        self.offsets = offsets
+        # labels[i] - True if word i is in the language, None if the corpus is not labelled
+        self.labels = labels
+
+    @staticmethod
+    def from_words(alphabet: str, words: List[str], labels=None) -> 'WordCorpus':
+        words = list(words)
+        lengths = np.fromiter(map(len, words), dtype=np.intp, count=len(words))
+        offsets = np.zeros(len(words) + 1, dtype=np.intp)
+        np.cumsum(lengths, out=offsets[1:])
+        if labels is not None:
+            labels = np.asarray(labels, dtype=bool)
+        return WordCorpus(alphabet, encode_words(alphabet, ''.join(words)), offsets, labels)
+
+    @staticmethod
+    def from_languages(alphabet: str, in_language: List[str], not_in_language: List[str]) -> 'WordCorpus':
+        # labelled corpus of the words in the language followed by the words not in the language
+        in_language = list(in_language)
+        not_in_language = list(not_in_language)
+        labels = np.concatenate([np.ones(len(in_language), dtype=bool), np.zeros(len(not_in_language), dtype=bool)])
+        return WordCorpus.from_words(alphabet, in_language + not_in_language, labels)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        # a word for an integer index, a corpus for a slice
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return self.take(np.arange(start, stop, step))
+            stop = max(start, stop)
+            labels = self.labels[start:stop] if self.labels is not None else None
+            return WordCorpus(self.alphabet, self.symbols, self.offsets[start:stop + 1], labels)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Word index out of range')
+        return decode_words(self.alphabet, self.symbols, self.offsets[index:index + 2])[0]
+
+    def __iter__(self):
+        return iter(self.words())
+
+    def words(self) -> List[str]:
+        symbols, offsets = self.encoded()
+        return decode_words(self.alphabet, symbols, offsets)
+
+    def encoded(self) -> (np.ndarray, np.ndarray):
+        # (symbols, offsets) of only the words of this corpus, offsets start at 0
+        start = self.offsets[0] if len(self.offsets) else 0
+        stop = self.offsets[-1] if len(self.offsets) else 0
+        return self.symbols[start:stop], self.offsets - start
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def take(self, indices) -> 'WordCorpus':
+        # a copy with only the selected words
+        indices = np.asarray(indices, dtype=np.intp)
+        symbols, offsets = take_words(self.symbols, self.offsets, indices)
+        labels = self.labels[indices] if self.labels is not None else None
+        return WordCorpus(self.alphabet, symbols, offsets, labels)
+
+    def in_language(self) -> 'WordCorpus':
+        return self.take(np.flatnonzero(self.labels))
+
+    def not_in_language(self) -> 'WordCorpus':
+        return self.take(np.flatnonzero(~self.labels))
+
+    def save(self, path: str):
+        with CorpusWriter(path, self.alphabet, len(self), self.labels is not None) as writer:
+            writer.write(self)
+
+    @staticmethod
+    def load(path: str) -> 'WordCorpus':
+        # the arrays are memory-mapped read-only, nothing is read until it is used
+        with open(path, 'rb') as file:
+            magic, symbol_size, labelled, count, alphabet_size = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise Exception(path + ' is not a corpus file')
+            alphabet = file.read(alphabet_size).decode('utf-8')
+        layout = file_layout(alphabet_size, count, labelled)
+        offsets = memory_map(path, '<i8', layout['offsets'], count + 1)
+        labels = memory_map(path, np.bool_, layout['labels'], count) if labelled else None
+        symbols = memory_map(path, '<u' + str(symbol_size), layout['symbols'], int(offsets[-1]))
+        return WordCorpus(alphabet, symbols, offsets, labels)
+
+    @property
+    def nbytes(self) -> int:
+        symbols, _ = self.encoded()
+        return symbols.nbytes + self.offsets.nbytes + (self.labels.nbytes if self.labels is not None else 0)
+
+    def __reduce__(self):
+        # a slice is pickled without the rest of the buffer it shares
+        symbols, offsets = self.encoded()
+        labels = np.array(self.labels) if self.labels is not None else None
+        return WordCorpus, (self.alphabet, np.array(symbols), offsets, labels)
+
+
+class CorpusWriter:
+    # writes a corpus file from consecutive corpora, the number of words has to be known when the file is created
+
+    def __init__(self, path: str, alphabet: str, count: int, labelled: bool = True):
+        self.alphabet = alphabet
+        self.count = count
+        self.labelled = labelled
+        self.dtype = np.dtype(symbol_dtype(alphabet)).newbyteorder('<')
+        encoded_alphabet = alphabet.encode('utf-8')
+        self.layout = file_layout(len(encoded_alphabet), count, labelled)
+        # words and letters written so far
+        self.words = 0
+        self.letters = 0
+
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, self.dtype.itemsize, int(labelled), count, len(encoded_alphabet)))
+        self.file.write(encoded_alphabet)
+        self.file.seek(self.layout['offsets'])
+        self.file.write(np.zeros(1, dtype='<i8').tobytes())
+        # the file is extended to the symbols, the gaps are filled by later writes
+        self.file.truncate(self.layout['symbols'])
+
+    def write(self, corpus: WordCorpus):
+        if corpus.alphabet != self.alphabet:
+            raise Exception('The corpus alphabet differs from the alphabet of the file')
+        if self.words + len(corpus) > self.count:
+            raise Exception('More than ' + str(self.count) + ' words written to a corpus file')
+        if self.labelled and corpus.labels is None:
+            raise Exception('Unlabelled words written to a labelled corpus file')
+        symbols, offsets = corpus.encoded()
+
+        self.file.seek(self.layout['offsets'] + 8 * (self.words + 1))
+        self.file.write((offsets[1:] + self.letters).astype('<i8').tobytes())
+        if self.labelled:
+            self.file.seek(self.layout['labels'] + self.words)
+            self.file.write(np.asarray(corpus.labels, dtype=np.bool_).tobytes())
+        self.file.seek(self.layout['symbols'] + self.letters * self.dtype.itemsize)
+        self.file.write(np.asarray(symbols).astype(self.dtype).tobytes())
+
+        self.words += len(corpus)
+        self.letters += len(symbols)
+
+    def close(self):
+        self.file.close()
+        if self.words != self.count:
+            raise Exception(str(self.words) + ' words written to a corpus file of ' + str(self.count) + ' words')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+
+def file_layout(alphabet_size: int, count: int, labelled: bool) -> dict:
+    # positions of the arrays in a corpus file
+    offsets = HEADER.size + padded(alphabet_size)
+    labels = offsets + 8 * (count + 1)
+    symbols = labels + (padded(count) if labelled else 0)
+    return {'offsets': offsets, 'labels': labels, 'symbols': symbols}
+
+
+def padded(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def memory_map(path: str, dtype, offset: int, count: int) -> np.ndarray:
+    # an empty array cannot be mapped
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+
+def symbol_dtype(alphabet: str):
+    if len(alphabet) <= 2**8:
+        return np.uint8
+    elif len(alphabet) <= 2**16:
+        return np.uint16
+    raise Exception('Alphabets longer than 65536 letters are not supported')
+
+
+def encode_words(alphabet: str, text: str) -> np.ndarray:
+    # positions of the letters of the text in the alphabet
+    dtype = symbol_dtype(alphabet)
+    positions = {letter: i for i, letter in reversed(list(enumerate(alphabet)))}
+    if all(ord(letter) < 256 for letter in alphabet):
+        table = np.full(256, -1, dtype=np.intp)
+        for letter, symbol in positions.items():
+            table[ord(letter)] = symbol
+        try:
+            codes = table[np.frombuffer(text.encode('latin-1'), dtype=np.uint8)]
+        except UnicodeEncodeError:
+            codes = np.array([-1])
+        if np.any(codes < 0):
+            raise ValueError('Words contain letters which are not in the alphabet')
+        return codes.astype(dtype)
+    if any(letter not in positions for letter in text):
+        raise ValueError('Words contain letters which are not in the alphabet')
+    return np.array([positions[letter] for letter in text], dtype=dtype)
+
+
+def decode_words(alphabet: str, codes: np.ndarray, offsets: np.ndarray) -> List[str]:
+    # the words codes[offsets[i]:offsets[i + 1]] as strings
+    start = offsets[0] if len(offsets) else 0
+    stop = offsets[-1] if len(offsets) else 0
+    codes = codes[start:stop]
+    if all(ord(letter) < 256 for letter in alphabet):
+        text = np.array([ord(letter) for letter in alphabet], dtype=np.uint8)[codes].tobytes().decode('latin-1')
+    else:
+        text = ''.join(np.array(list(alphabet))[codes])
+    bounds = (offsets - start).tolist()
+    return [text[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+
+def take_words(codes: np.ndarray, offsets: np.ndarray, indices: np.ndarray) -> (np.ndarray, np.ndarray):
+    # (codes, offsets) of the selected words, without a python loop over them
+    lengths = np.diff(offsets)[indices]
+    new_offsets = np.zeros(len(indices) + 1, dtype=np.intp)
+    np.cumsum(lengths, out=new_offsets[1:])
+    positions = np.arange(new_offsets[-1]) + np.repeat(offsets[:-1][indices] - new_offsets[:-1], lengths)
+    return codes[positions], new_offsets
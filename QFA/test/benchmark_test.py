@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from QFA import Benchmark
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_random_automata(self):
+        rng = np.random.default_rng(0)
+        u = Benchmark.random_unitary(8, rng)
+        np.testing.assert_allclose(u.conj().T @ u, np.eye(8), atol=1e-12)
+        m = Benchmark.random_stochastic(8, rng)
+        np.testing.assert_allclose(m.sum(axis=1), np.ones(8))
+
+        for kind in Benchmark.AUTOMATA:
+            automaton = Benchmark.random_automaton(kind, 8, 3, rng)
+            self.assertEqual(automaton.alphabet, 'abc')
+            p, e = automaton.process_many(['', 'abc', 'cab'])
+            self.assertTrue(np.all((-1e-12 <= p) & (p <= 1 + 1e-12)))
+            self.assertTrue(np.all((0 <= e) & (e <= 1 + 1e-12)))
+
+    def test_quick_run(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            Benchmark.main(['--quick', '--repeat', '1', '--output', path, '--modes', 'batch', 'trie',
+                            '--precisions', 'double', 'single'])
+            with open(path) as file:
+                report = json.load(file)
+
+        self.assertTrue(report['environment']['quick'])
+        results = report['results']
+        automata = [r for r in results if r['benchmark'] == 'automaton']
+        self.assertEqual({(r['automaton'], r['mode'], r['precision']) for r in automata},
+                         {(kind, mode, precision) for kind in Benchmark.AUTOMATA for mode in ['batch', 'trie']
+                          for precision in ['double', 'single']})
+        self.assertEqual({r['method'] for r in results if r['benchmark'] == 'generator'},
+                         {'get_language_sample', 'get_random_sample', 'get_uniform_sample'})
+        self.assertEqual(len([r for r in results if r['benchmark'] == 'checker']), len(Benchmark.AUTOMATA))
+        for result in results:
+            self.assertGreater(result['words_per_second'], 0)
+            self.assertGreater(result['peak_memory_bytes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
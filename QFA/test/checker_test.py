@@ -1,8 +1,25 @@
+import itertools
+import os
+import random
+import tempfile
 import unittest
-from QFA import LanguageChecker as Checker, GQFA
+import matplotlib.pyplot as plt
+import numpy as np
+from QFA import LanguageChecker as Checker, GQFA, MM_1QFA as MM, MO_1QFA as MO, PFA
+from QFA.LanguageGenerator import LanguageGenerator
+from QFA.ParallelExecutor import ParallelExecutor
+from QFA.Plotter import Plotter
+from QFA.ResultStatistics import ResultStatistics
 
 
 class LanguageCheckerTest(unittest.TestCase):
+
+    def assertAcceptedAlmostEqual(self, accepted, expected):
+        # results of words evaluated in different batches may differ by rounding errors
+        self.assertEqual(accepted.keys(), expected.keys())
+        for key in expected:
+            np.testing.assert_allclose(accepted[key], expected[key], atol=1e-12)
+
     def test_init(self):
         gqfa = GQFA.example()
         gqfa_checker = Checker.LanguageChecker(gqfa, ["aa", "aaa"], ["a"])
@@ -31,6 +48,278 @@ class LanguageCheckerTest(unittest.TestCase):
 
         self.assertAlmostEqual(lambda_ + epsilon, gqfa_checker.accepted['cutpoint'], delta=error)
 
+    def test_witnesses(self):
+        gqfa = GQFA.example()
+        gqfa_checker = Checker.LanguageChecker(gqfa, ["aa", "aaa", "aaaa"], ["a", "aaaaa"])
+        gqfa_checker.check_language()
+        results = dict(language=gqfa_checker.lang_results, not_in_language=gqfa_checker.not_lang_results)
+
+        self.assertEqual(gqfa_checker.lang_results.shape, (3, 2))
+        self.assertEqual(set(gqfa_checker.witnesses),
+                         {'cutpoint', 'isolated_cutpoint', 'Monte_Carlo', 'bounded', 'negative_unbounded'})
+        self.assertEqual(set(gqfa_checker.accepted), {'positive_unbounded'})
+
+        # 'aaaaa' is accepted with higher probability than 'aaa'
+        self.assertEqual(gqfa_checker.witnesses['cutpoint'], ('not_in_language', 1))
+        self.assertEqual(gqfa_checker.witnesses['isolated_cutpoint'], ('not_in_language', 1))
+
+        # the first word in the language not accepted with certainty
+        self.assertEqual(gqfa_checker.witnesses['negative_unbounded'], ('language', 0))
+        self.assertEqual(gqfa_checker.witnesses['Monte_Carlo'], ('language', 0))
+        # the word which needs the largest epsilon
+        partition, index = gqfa_checker.witnesses['bounded']
+        p, e = results[partition][index]
+        epsilon = 1 - p - e if partition == 'language' else p + e
+        self.assertGreaterEqual(epsilon, 1/2)
+
+    def test_witness_cutpoint(self):
+        pfa = PFA.pfa_example()
+        # 'aa' and 'ab' are both accepted with probability 1/2, 'bbb' and 'bb' with 0
+        pfa_checker = Checker.LanguageChecker(pfa, ["aa", "bbb"], ["ab", "bb"])
+        pfa_checker.check_language()
+
+        self.assertNotIn('cutpoint', pfa_checker.accepted)
+        self.assertEqual(pfa_checker.witnesses['cutpoint'], ('not_in_language', 0))
+        self.assertEqual(pfa_checker.witnesses['negative_unbounded'], ('language', 0))
+
+    def test_trie_mode(self):
+        automata = [(PFA.pfa_example(), 'ab'), (MO.mo_1qfa_example_3(), '01'),
+                    (MM.example(), 'a'), (GQFA.example(), 'a')]
+        for automaton, alphabet in automata:
+            language, not_in_language = LanguageGenerator('(' + alphabet[0] + '\a)*', alphabet).get_language_sample(200)
+
+            batch_checker = Checker.LanguageChecker(automaton, language, not_in_language)
+            batch_checker.run()
+            trie_checker = Checker.LanguageChecker(automaton, language, not_in_language, mode='trie')
+            trie_checker.run()
+
+            for batch_results, trie_results in [(batch_checker.lang_results, trie_checker.lang_results),
+                                                (batch_checker.not_lang_results, trie_checker.not_lang_results)]:
+                self.assertEqual(len(batch_results), len(trie_results))
+                for (p_batch, e_batch), (p_trie, e_trie) in zip(batch_results, trie_results):
+                    self.assertAlmostEqual(p_batch, p_trie, places=12)
+                    self.assertAlmostEqual(e_batch, e_trie, places=12)
+
+    def test_parallel(self):
+        automaton = MM.example()
+        language, not_in_language = LanguageGenerator('(aa)*', 'a').get_language_sample(300)
+        checker = Checker.LanguageChecker(automaton, language, not_in_language)
+        checker.run()
+
+        for kind in ['thread', 'process']:
+            for mode in ['batch', 'trie']:
+                with ParallelExecutor(kind, workers=2, chunk_size=64) as executor:
+                    parallel_checker = Checker.LanguageChecker(automaton, language, not_in_language, mode, executor)
+                    parallel_checker.run()
+
+                for expected, results in [(checker.lang_results, parallel_checker.lang_results),
+                                          (checker.not_lang_results, parallel_checker.not_lang_results)]:
+                    self.assertEqual(len(expected), len(results))
+                    for (p_expected, e_expected), (p, e) in zip(expected, results):
+                        self.assertAlmostEqual(p_expected, p, places=12)
+                        self.assertAlmostEqual(e_expected, e, places=12)
+
+    def test_parallel_stream(self):
+        automaton = MO.mo_1qfa_example_4()
+        language, not_in_language = LanguageGenerator('(aaa)*', 'a').get_language_sample(300)
+        accepted = Checker.LanguageChecker(automaton, language, not_in_language).check_language()
+        other = MM.example()
+        expected = other.process_many(language)
+
+        for kind in ['thread', 'process']:
+            with ParallelExecutor(kind, workers=2, chunk_size=16) as executor:
+                # every chunk of the stream is evaluated by the same workers and the same shared kernel
+                stream_checker = Checker.LanguageChecker(automaton, language, not_in_language, executor=executor)
+                self.assertAcceptedAlmostEqual(stream_checker.check_stream(chunk_size=40), accepted)
+                pool, shared_kernel = executor.pool, executor.shared_kernel
+                self.assertAcceptedAlmostEqual(stream_checker.check_stream(chunk_size=40), accepted)
+                self.assertIs(executor.pool, pool)
+                self.assertIs(executor.shared_kernel, shared_kernel)
+
+                # another automaton replaces the kernel, the workers are kept
+                p, e = executor.run(other, language)
+                np.testing.assert_allclose(p, expected[0])
+                np.testing.assert_allclose(e, expected[1], atol=1e-12)
+                self.assertIs(executor.pool, pool)
+                self.assertIs(executor.kernel, other.compile())
+            self.assertIsNone(executor.pool)
+            self.assertIsNone(executor.shared_kernel)
+
+    def test_stream(self):
+        automaton = MO.mo_1qfa_example_4()
+        language, not_in_language = LanguageGenerator('(aaa)*', 'a').get_language_sample(300)
+        checker = Checker.LanguageChecker(automaton, language, not_in_language)
+        accepted = checker.check_language()
+
+        stream_checker = Checker.LanguageChecker(automaton, iter(language), (w for w in not_in_language))
+        self.assertAcceptedAlmostEqual(stream_checker.check_stream(chunk_size=7), accepted)
+        self.assertEqual(len(stream_checker.lang_results), 0)
+
+        labelled_words = [(w, True) for w in language] + [(w, False) for w in not_in_language]
+        random.shuffle(labelled_words)
+        labelled_checker = Checker.LanguageChecker(automaton, [], [])
+        self.assertAcceptedAlmostEqual(labelled_checker.check_stream(iter(labelled_words), chunk_size=50), accepted)
+
+        statistics = labelled_checker.statistics
+        self.assertEqual(statistics.lang_count, len(language))
+        self.assertEqual(statistics.not_lang_count, len(not_in_language))
+        self.assertEqual(statistics.lang_histogram.sum(), len(language))
+        # words in (aaa)* are accepted with probability 1, the others with 1/4 (up to rounding, so bin 24 or 25)
+        self.assertEqual(statistics.lang_histogram[-1], len(language))
+        self.assertEqual(statistics.not_lang_histogram[24:26].sum(), len(not_in_language))
+
+    def test_bounded_error_with_errors(self):
+        # epsilon is the largest p + e of the words not in the language, in any order of the words
+        for order in [[0, 1], [1, 0]]:
+            statistics = ResultStatistics()
+            statistics.update(True, np.array([1.0]), np.array([0.0]))
+            statistics.update(False, np.array([0.3, 0.29])[order], np.array([0.0, 0.05])[order])
+            self.assertAlmostEqual(statistics.bounded_error(), 0.34)
+            self.assertAlmostEqual(statistics.accepted()['bounded'], 0.34)
+
+    def test_add_words(self):
+        automaton = GQFA.example()
+        checker = Checker.LanguageChecker(automaton, ["aa"], ["a"])
+        checker.check_language()
+
+        accepted = checker.add_words(["aaa"], [])
+        expected = Checker.LanguageChecker(automaton, ["aa", "aaa"], ["a"]).check_language()
+        self.assertAcceptedAlmostEqual(accepted, expected)
+        self.assertEqual(checker.language, ["aa", "aaa"])
+        self.assertEqual(len(checker.lang_results), 2)
+
+        # words are evaluated only once
+        calls = []
+        process_many = automaton.process_many
+        automaton.process_many = lambda words: calls.append(words) or process_many(words)
+        accepted = checker.add_words(["aaaaaa", "aaaa"], ["aaaaa"])
+        self.assertEqual(calls, [["aaaaaa", "aaaa", "aaaaa"]])
+
+        expected = Checker.LanguageChecker(automaton, ["aa", "aaa", "aaaaaa", "aaaa"], ["a", "aaaaa"]).check_language()
+        self.assertAcceptedAlmostEqual(accepted, expected)
+
+    def test_add_words_incrementally(self):
+        automaton = MO.mo_1qfa_example_4()
+        language, not_in_language = LanguageGenerator('(aaa)*', 'a').get_language_sample(200)
+        given_language, given_not_in_language = language[:1], not_in_language[:1]
+        checker = Checker.LanguageChecker(automaton, given_language, given_not_in_language)
+        checker.run()
+        for i in range(1, max(len(language), len(not_in_language)), 10):
+            checker.add_words(language[i:i + 10], not_in_language[i:i + 10])
+
+        # the given lists are not changed, the checker extends its own copies
+        self.assertEqual((given_language, given_not_in_language), (language[:1], not_in_language[:1]))
+        self.assertEqual((checker.language, checker.not_in_language), (language, not_in_language))
+        expected = Checker.LanguageChecker(automaton, language, not_in_language)
+        self.assertAcceptedAlmostEqual(checker.accepted, expected.check_language())
+        np.testing.assert_allclose(checker.lang_results, expected.lang_results)
+        np.testing.assert_allclose(checker.not_lang_results, expected.not_lang_results)
+        np.testing.assert_array_equal(checker.lang_indices, np.arange(len(language)))
+        np.testing.assert_array_equal(checker.not_lang_indices, np.arange(len(not_in_language)))
+
+    def test_add_words_after_stream(self):
+        automaton = MO.mo_1qfa_example_4()
+        checker = Checker.LanguageChecker(automaton, iter(['aaa', 'aaaaaaaaa']), iter(['a', 'aaaa']))
+        checker.check_stream(chunk_size=1)
+        # generators are read once
+        accepted = checker.add_words((w for w in ['aaaaaa']), (w for w in ['aa']))
+
+        expected = Checker.LanguageChecker(automaton, ['aaa', 'aaaaaaaaa', 'aaaaaa'], ['a', 'aaaa', 'aa'])
+        self.assertAcceptedAlmostEqual(accepted, expected.check_language())
+        self.assertEqual((checker.statistics.lang_count, checker.statistics.not_lang_count), (3, 3))
+        # the new words are counted after the streamed ones
+        self.assertEqual(checker.lang_indices.tolist(), [2])
+        self.assertEqual(checker.not_lang_indices.tolist(), [2])
+        self.assertEqual(len(checker.lang_results), 1)
+
+    def test_add_words_before_run(self):
+        automaton = PFA.pfa_example()
+        checker = Checker.LanguageChecker(automaton, ["aa"], ["ab"])
+        accepted = checker.add_words(["aaaaa"], ["b", "aaa"])
+
+        expected = Checker.LanguageChecker(automaton, ["aa", "aaaaa"], ["ab", "b", "aaa"]).check_language()
+        self.assertAcceptedAlmostEqual(accepted, expected)
+
+    def test_save_results(self):
+        automaton = PFA.pfa_example()
+        checker = Checker.LanguageChecker(automaton, ["aa"], ["ab"])
+        checker.add_words(["aaaaa"], ["b", "aaa"])
+        self.assertEqual(checker.lang_probabilities.dtype, np.float64)
+        self.assertEqual(checker.lang_indices.tolist(), [0, 1])
+        self.assertEqual(checker.not_lang_indices.tolist(), [0, 1, 2])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.npz')
+            checker.save_results(path)
+
+            loaded = Checker.LanguageChecker(None, [], [])
+            self.assertEqual(loaded.load_results(path), checker.accepted)
+            self.assertEqual(loaded.witnesses, checker.witnesses)
+            np.testing.assert_array_equal(loaded.lang_results, checker.lang_results)
+            np.testing.assert_array_equal(loaded.not_lang_results, checker.not_lang_results)
+            np.testing.assert_array_equal(loaded.not_lang_indices, checker.not_lang_indices)
+
+            plotter = Plotter.from_results(path)
+            np.testing.assert_array_equal(plotter.language_checker.lang_probabilities, checker.lang_probabilities)
+
+    def test_save_histogram(self):
+        automaton = MO.mo_1qfa_example_4()
+        language, not_in_language = LanguageGenerator('(aaa)*', 'a').get_language_sample(300)
+        checker = Checker.LanguageChecker(automaton, iter(language), iter(not_in_language))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'histogram.png')
+            Plotter(checker).save_histogram(path, chunk_size=50, bins=20)
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read(8), b'\x89PNG\r\n\x1a\n')
+
+        # the words were streamed, only the counts are kept
+        self.assertEqual(len(checker.lang_probabilities), 0)
+        self.assertEqual(checker.statistics.bins, 20)
+        self.assertEqual(checker.statistics.lang_histogram.sum(), len(language))
+        self.assertIn('isolated_cutpoint', checker.accepted)
+
+        # the statistics have 20 bins
+        with self.assertRaises(Exception):
+            Plotter(checker).save_histogram(path, bins=50)
+
+    def test_plot_streamed(self):
+        automaton = MO.mo_1qfa_example_4()
+        language, not_in_language = LanguageGenerator('(aaa)*', 'a').get_language_sample(300)
+        checker = Checker.LanguageChecker(automaton, iter(language), iter(not_in_language))
+        checker.check_stream(chunk_size=50, bins=20)
+
+        # the bars are drawn from the counts of the statistics
+        plt.figure()
+        Plotter(checker).plot()
+        heights = [patch.get_height() for patch in plt.gca().patches]
+        plt.close()
+        self.assertEqual(len(heights), 40)
+        self.assertEqual(sum(heights[20:]), len(language))
+        self.assertEqual(sum(heights[:20]), len(not_in_language))
+
+    def test_check_exhaustive(self):
+        automaton = MO.mo_1qfa_example_4()
+        words = [w for length in range(1, 9) for w in map(''.join, itertools.product('a', repeat=length))]
+        language = [w for w in words if len(w) % 3 == 0]
+        not_in_language = [w for w in words if len(w) % 3]
+        expected = Checker.LanguageChecker(automaton, language, not_in_language).check_language()
+
+        checker = Checker.LanguageChecker(automaton, [], [])
+        self.assertAcceptedAlmostEqual(checker.check_exhaustive('(aaa)*', 8, 1), expected)
+        self.assertEqual(checker.statistics.lang_count, len(language))
+        self.assertEqual(checker.statistics.not_lang_count, len(not_in_language))
+
+        automaton = GQFA.example()
+        checker = Checker.LanguageChecker(automaton, [], [])
+        checker.check_exhaustive('a(aa)*', 7, block_size=2)
+        self.assertEqual(set(checker.witness_words), set(checker.witnesses))
+        # the witness of bounded error is the word not in the language accepted with the highest probability
+        self.assertEqual(checker.witnesses['bounded'][0], 'not_in_language')
+        p, e = automaton.process(checker.witness_words['bounded'])
+        self.assertAlmostEqual(p + e, checker.statistics.not_lang_max_upper)
+        self.assertEqual(len(checker.witness_words['bounded']) % 2, 0)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,179 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from QFA import LanguageChecker as Checker, MM_1QFA as MM, MO_1QFA as MO, PFA
+from QFA.LanguageGenerator import LanguageGenerator
+from QFA.ParallelExecutor import ParallelExecutor
+from QFA.WordCorpus import CorpusWriter, WordCorpus
+
+
+class WordCorpusTest(unittest.TestCase):
+
+    def test_from_words(self):
+        corpus = WordCorpus.from_words('abc', ['ab', '', 'cab', 'a'])
+
+        self.assertEqual(len(corpus), 4)
+        self.assertEqual(corpus.symbols.dtype, np.uint8)
+        self.assertEqual(corpus.symbols.tolist(), [0, 1, 2, 0, 1, 0])
+        self.assertEqual(corpus.offsets.tolist(), [0, 2, 2, 5, 6])
+        self.assertEqual(corpus.words(), ['ab', '', 'cab', 'a'])
+        self.assertEqual(list(corpus), ['ab', '', 'cab', 'a'])
+        self.assertEqual(corpus[2], 'cab')
+        self.assertEqual(corpus[-1], 'a')
+        self.assertIsNone(corpus.labels)
+
+        self.assertRaises(ValueError, WordCorpus.from_words, 'abc', ['abd'])
+        self.assertRaises(IndexError, corpus.__getitem__, 4)
+
+    def test_long_alphabet(self):
+        alphabet = ''.join(chr(0x100 + i) for i in range(300))
+        words = [alphabet[5:9], alphabet[299], alphabet[:2]]
+        corpus = WordCorpus.from_words(alphabet, words)
+
+        self.assertEqual(corpus.symbols.dtype, np.uint16)
+        self.assertEqual(corpus.words(), words)
+
+    def test_slices(self):
+        corpus = WordCorpus.from_languages('ab', ['a', 'ab', 'abb'], ['b', 'ba'])
+
+        self.assertEqual(corpus.labels.tolist(), [True, True, True, False, False])
+        part = corpus[1:4]
+        self.assertEqual(part.words(), ['ab', 'abb', 'b'])
+        self.assertEqual(part.labels.tolist(), [True, True, False])
+        # contiguous slices share the buffers
+        self.assertTrue(np.shares_memory(part.symbols, corpus.symbols))
+        self.assertTrue(np.shares_memory(part.offsets, corpus.offsets))
+        self.assertEqual(part[1:].words(), ['abb', 'b'])
+        self.assertEqual(len(corpus[3:1]), 0)
+
+        self.assertEqual(corpus[::2].words(), ['a', 'abb', 'ba'])
+        self.assertEqual(corpus.in_language().words(), ['a', 'ab', 'abb'])
+        self.assertEqual(corpus.not_in_language().words(), ['b', 'ba'])
+
+        # a pickled slice does not carry the rest of the buffer
+        restored = pickle.loads(pickle.dumps(part))
+        self.assertEqual(restored.words(), ['ab', 'abb', 'b'])
+        self.assertEqual(len(restored.symbols), 6)
+        self.assertEqual(restored.offsets[0], 0)
+        self.assertEqual(part.nbytes, 6 + 4 * part.offsets.itemsize + 3)
+
+    def test_process_many(self):
+        cases = [(PFA.pfa_example(), ['', 'a', 'ab', 'ba', 'aab', 'bbb', 'abab'], ['ab', 'ba', 'cba']),
+                 (MM.example(), ['aa', '', 'aaaa', 'a', 'aaaaa'], ['a', 'ba'])]
+        for automaton, words, alphabets in cases:
+            expected_p, expected_e = automaton.process_many(words)
+            # the corpus alphabet does not have to be the automaton's one
+            for alphabet in alphabets:
+                p, e = automaton.process_many(WordCorpus.from_words(alphabet, words))
+                np.testing.assert_allclose(p, expected_p, atol=1e-12)
+                np.testing.assert_allclose(e, expected_e, atol=1e-12)
+
+            p, e = automaton.process_many(WordCorpus.from_words(alphabets[0], words)[2:5])
+            np.testing.assert_allclose(p, expected_p[2:5], atol=1e-12)
+
+            p, e = automaton.process_trie(WordCorpus.from_words(alphabets[0], words))
+            np.testing.assert_allclose(p, expected_p, atol=1e-12)
+
+        self.assertRaises(ValueError, PFA.pfa_example().process_many, WordCorpus.from_words('abc', ['ac']))
+
+    def test_checker(self):
+        automaton = MO.mo_1qfa_example_4()
+        language, not_in_language = LanguageGenerator('(aaa)*', 'a').get_language_sample(300)
+        expected = Checker.LanguageChecker(automaton, language, not_in_language).check_language()
+
+        corpus = WordCorpus.from_languages('a', language, not_in_language)
+        checker = Checker.LanguageChecker(automaton, corpus)
+        accepted = checker.check_language()
+        self.assertEqual(accepted.keys(), expected.keys())
+        self.assertEqual(len(checker.lang_results), len(language))
+        self.assertEqual(checker.language.words(), language)
+
+        stream_checker = Checker.LanguageChecker(automaton, [], [])
+        self.assertEqual(stream_checker.check_stream(corpus, chunk_size=32).keys(), expected.keys())
+        self.assertEqual(stream_checker.statistics.lang_count, len(language))
+
+        for kind in ['thread', 'process']:
+            with ParallelExecutor(kind, workers=2, chunk_size=64) as executor:
+                parallel_checker = Checker.LanguageChecker(automaton, corpus, executor=executor)
+                parallel_checker.run()
+            np.testing.assert_allclose(parallel_checker.lang_results, checker.lang_results, atol=1e-12)
+            np.testing.assert_allclose(parallel_checker.not_lang_results, checker.not_lang_results, atol=1e-12)
+
+    def test_generator(self):
+        lg = LanguageGenerator('a*b', 'ab')
+        corpus = lg.get_random_sample(200, max_len=8, seed=0, corpus=True)
+        i, n = lg.get_random_sample(200, max_len=8, seed=0)
+
+        self.assertEqual(len(corpus), 200)
+        self.assertEqual(corpus.in_language().words(), i)
+        self.assertEqual(corpus.not_in_language().words(), n)
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corpus')
+            corpus = WordCorpus.from_languages('abc', ['a', 'abc', ''], ['cc', 'b'])
+            corpus.save(path)
+            loaded = WordCorpus.load(path)
+            self.assertIsInstance(loaded.symbols, np.memmap)
+            self.assertEqual(loaded.alphabet, 'abc')
+            self.assertEqual(loaded.words(), corpus.words())
+            self.assertEqual(loaded.labels.tolist(), corpus.labels.tolist())
+            self.assertEqual(loaded[1:3].words(), ['abc', ''])
+            del loaded
+
+            unlabelled_path = os.path.join(directory, 'unlabelled')
+            alphabet = ''.join(chr(0x100 + i) for i in range(300))
+            words = [alphabet[5:9], alphabet[299], '']
+            with CorpusWriter(unlabelled_path, alphabet, 3, labelled=False) as writer:
+                writer.write(WordCorpus.from_words(alphabet, words[:2]))
+                writer.write(WordCorpus.from_words(alphabet, words[2:]))
+            loaded = WordCorpus.load(unlabelled_path)
+            self.assertEqual(loaded.words(), words)
+            self.assertIsNone(loaded.labels)
+            del loaded
+
+            writer = CorpusWriter(os.path.join(directory, 'short'), 'ab', 3)
+            writer.write(WordCorpus.from_words('ab', ['a'], [True]))
+            self.assertRaises(Exception, writer.write, WordCorpus.from_words('ab', ['a'] * 3, [True] * 3))
+            self.assertRaises(Exception, writer.close)
+
+            empty_path = os.path.join(directory, 'empty')
+            WordCorpus.from_words('ab', [], []).save(empty_path)
+            self.assertEqual(len(WordCorpus.load(empty_path)), 0)
+
+    def test_checker_file(self):
+        automaton = MO.mo_1qfa_example_4()
+        lg = LanguageGenerator('(aaa)*', 'a')
+        corpus = lg.get_random_sample(60, max_len=100, seed=2, batch_size=16, corpus=True)
+        expected = Checker.LanguageChecker(automaton, corpus).check_language()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corpus')
+            lg.write_random_sample(path, 60, max_len=100, seed=2, batch_size=16)
+            loaded = WordCorpus.load(path)
+            self.assertEqual(loaded.words(), corpus.words())
+            del loaded
+
+            checker = Checker.LanguageChecker(automaton, [], [])
+            self.assertEqual(checker.check_stream(path, chunk_size=7).keys(), expected.keys())
+            self.assertEqual(checker.statistics.lang_count, corpus.labels.sum())
+            self.assertEqual(checker.statistics.not_lang_count, 60 - corpus.labels.sum())
+
+    def test_unlabelled_checker(self):
+        automaton = MO.mo_1qfa_example_4()
+        corpus = WordCorpus.from_words('a', ['a', 'aa', 'aaa'])
+        with self.assertRaisesRegex(ValueError, 'corpus has no labels'):
+            Checker.LanguageChecker(automaton, corpus)
+        with self.assertRaisesRegex(ValueError, 'corpus has no labels'):
+            Checker.LanguageChecker(automaton, [], []).check_stream(corpus)
+
+        # an unlabelled corpus can still be given with the words not in the language
+        checker = Checker.LanguageChecker(automaton, corpus, WordCorpus.from_words('a', ['aaaa']))
+        checker.run()
+        self.assertEqual(len(checker.lang_results), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import numpy as np
+from QFA import GQFA, MM_1QFA as MM, MO_1QFA as MO, PFA
+from QFA.Equivalence import distinguishing_word, equivalent, linear_representation, span
+
+
+class EquivalenceTest(unittest.TestCase):
+
+    def test_linear_representation(self):
+        for automaton in [PFA.pfa_example(), MO.mo_1qfa_example_4(), MM.example(), GQFA.example()]:
+            initial, operators, final = linear_representation(automaton)
+            for word in ['', 'a', 'aa', 'aaa', 'aaaa']:
+                state = initial
+                for letter in word:
+                    state = operators[letter] @ state
+                self.assertAlmostEqual((final @ state).real, automaton.process(word)[0])
+
+    def test_span(self):
+        # the cyclic permutation of 3 states reaches all of them
+        a_matrix = np.array([[0, 0, 1], [1, 0, 0], [0, 1, 0]])
+        basis, words, vectors = span(np.array([1.0, 0, 0]), [a_matrix, np.eye(3)])
+        self.assertEqual(basis.shape, (3, 3))
+        np.testing.assert_allclose(basis.T @ basis, np.eye(3), atol=1e-12)
+        self.assertEqual(words, [(), (0,), (0, 0)])
+
+        basis, words, vectors = span(np.array([1.0, 1, 1]), [a_matrix])
+        self.assertEqual(basis.shape, (3, 1))
+
+    def test_equivalent(self):
+        # the GQFA example is the MM_1QFA example written with a measurement for every letter
+        self.assertTrue(equivalent(GQFA.example(), MM.example()))
+
+        # the same deterministic automaton as a PFA and as a MO_1QFA
+        pfa = PFA.dfa_example()
+        mo_1qfa = MO.MO_1QFA('ab', np.array([[1], [0], [0]]), [m.T for m in pfa.transition_matrices],
+                             np.diag([0, 0, 1]))
+        self.assertTrue(equivalent(pfa, mo_1qfa))
+        self.assertIsNone(distinguishing_word(mo_1qfa, pfa))
+
+    def test_distinguishing_word(self):
+        first = PFA.dfa_example()
+        second = PFA.pfa_example()
+        word = distinguishing_word(first, second)
+        self.assertEqual(word, 'a')
+        self.assertNotAlmostEqual(first.process(word)[0], second.process(word)[0])
+
+        # the acceptance vectors differ only on the state reached after 'a'
+        second = PFA.dfa_example()
+        second.acceptance_vector = np.array([[0], [1], [1]])
+        word = distinguishing_word(first, second)
+        self.assertEqual(word, 'a')
+
+        with self.assertRaises(Exception):
+            distinguishing_word(PFA.pfa_example(), MO.mo_1qfa_example_4())
+
+
+if __name__ == '__main__':
+    unittest.main()
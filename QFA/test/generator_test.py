@@ -1,5 +1,10 @@
+import re
+import random
+import itertools
 import unittest
+import numpy as np
 from QFA import LanguageGenerator as Gen
+from QFA.DFA import regex_to_dfa
 
 class LanguageGeneratorTest(unittest.TestCase):
 
@@ -26,6 +31,103 @@ class LanguageGeneratorTest(unittest.TestCase):
         self.assertEqual(len(i), 1000)
         self.assertEqual(len(n), 0)
 
+    def test_dfa_matches_re(self):
+        alphabet = 'abc'
+        regexes = ['[ca]+.[abc]*a[bc]?', '(a|bc)*', 'a{2,3}b{,2}c{2}', '(?:ab|c)+?a?', '[^a]*', '\\w\\D',
+                   'a{,}', '(a(b|)c)*|b+', 'x*a']
+        words = [''.join(w) for length in range(6) for w in itertools.product(alphabet, repeat=length)]
+        for regex in regexes:
+            dfa = regex_to_dfa(regex, alphabet)
+            p = re.compile(regex)
+            for w in words:
+                self.assertEqual(dfa.accepts(w), p.fullmatch(w) is not None, (regex, w))
+
+    def test_dfa_counts(self):
+        dfa = regex_to_dfa('(ab)*a?', 'ab')
+        counts = dfa.count_words(6)
+        self.assertEqual([c[dfa.start] for c in counts], [1, 1, 1, 1, 1, 1, 1])
+        complement_counts = dfa.complement().count_words(6)
+        self.assertEqual([c[dfa.start] for c in complement_counts], [2**k - 1 for k in range(7)])
+
+        # python integers do not overflow
+        self.assertEqual(regex_to_dfa('[ab]*', 'ab').count_words(100)[100][0], 2**100)
+
+    def test_uniform_sample(self):
+        lg = Gen.LanguageGenerator('[ca]+.\a*a[jk]?', 'abcdefghijk')
+        i, n = lg.get_uniform_sample(1000, in_language_percent=30, max_len=50, seed=0)
+
+        self.assertEqual(len(i), 300)
+        self.assertEqual(len(n), 700)
+        self.assertEqual(len(set(i + n)), 1000)
+        p = re.compile(lg.regex)
+        self.assertTrue(all(p.fullmatch(w) for w in i))
+        self.assertTrue(all(p.fullmatch(w) is None for w in n))
+        self.assertTrue(all(len(w) <= 50 for w in i + n))
+
+        # the same seed gives the same sample, the global random state is not used
+        random.seed(1)
+        self.assertEqual(lg.get_uniform_sample(1000, in_language_percent=30, max_len=50, seed=0), (i, n))
+        self.assertNotEqual(lg.get_uniform_sample(1000, in_language_percent=30, max_len=50, seed=1), (i, n))
+
+    def test_uniform_sample_small_language(self):
+        lg = Gen.LanguageGenerator('(aa)*', 'ab')
+        i, n = lg.get_uniform_sample(100, in_language_percent=50, max_len=10, min_len=2)
+
+        # only 5 words of the language have lengths between 2 and 10
+        self.assertEqual(sorted(i), ['aa', 'aaaa', 'aaaaaa', 'aaaaaaaa', 'aaaaaaaaaa'])
+        self.assertEqual(len(n), 50)
+        self.assertTrue(all(2 <= len(w) <= 10 and w not in i for w in n))
+
+    def test_uniform_sample_is_uniform(self):
+        random.seed(1)
+        lg = Gen.LanguageGenerator('a[ab]{3}', 'ab')
+        counts = dict.fromkeys([''.join(w) for w in itertools.product('ab', repeat=3)], 0)
+        for _ in range(800):
+            w = lg.get_dfa().sample(4, lg.get_dfa().count_words(4))
+            counts[w[1:]] += 1
+        self.assertTrue(all(60 < c < 140 for c in counts.values()))
+
+    def test_random_sample(self):
+        lg = Gen.LanguageGenerator('[ca]+.\a*a[jk]?', 'abcdefghijk')
+        i, n = lg.get_random_sample(5000, max_len=20, min_len=1, seed=3, batch_size=1000)
+
+        self.assertEqual(len(i) + len(n), 5000)
+        self.assertEqual(len(set(i + n)), 5000)
+        p = re.compile(lg.regex)
+        self.assertTrue(all(p.fullmatch(w) for w in i))
+        self.assertTrue(all(p.fullmatch(w) is None for w in n))
+        self.assertTrue(all(1 <= len(w) <= 20 for w in i + n))
+
+        self.assertEqual(lg.get_random_sample(5000, max_len=20, min_len=1, seed=3, batch_size=1000), (i, n))
+        self.assertNotEqual(lg.get_random_sample(5000, max_len=20, min_len=1, seed=4, batch_size=1000), (i, n))
+
+    def test_random_sample_encoded(self):
+        lg = Gen.LanguageGenerator('a*b', 'ab')
+        i, n, (i_codes, i_offsets), (n_codes, n_offsets) = lg.get_random_sample(200, max_len=8, seed=0, encoded=True)
+
+        self.assertEqual(len(i_offsets), len(i) + 1)
+        self.assertEqual(len(n_offsets), len(n) + 1)
+        for words, codes, offsets in ((i, i_codes, i_offsets), (n, n_codes, n_offsets)):
+            for k, w in enumerate(words):
+                self.assertEqual(''.join('ab'[c] for c in codes[offsets[k]:offsets[k + 1]]), w)
+
+    def test_random_sample_all_words(self):
+        lg = Gen.LanguageGenerator('(ab)*', 'ab')
+        i, n = lg.get_random_sample(2**11 - 1, max_len=10, seed=0)
+
+        self.assertEqual(sorted(i), ['ab'*k for k in range(6)])
+        self.assertEqual(len(set(n)), 2**11 - 7)
+        self.assertRaises(Exception, lg.get_random_sample, 2**11, max_len=10)
+
+    def test_hash_words(self):
+        codes = np.array([0, 1, 1, 0, 0, 0, 1, 0], dtype=np.uint8)
+        offsets = np.array([0, 2, 4, 4, 5, 6, 8])
+        hashes = Gen.hash_words(codes, offsets)
+        # 'ab', 'ba', '', 'a', 'a', 'ba'
+        self.assertEqual(len(set(hashes.tolist())), 4)
+        self.assertEqual(hashes[3], hashes[4])
+        self.assertEqual(hashes[1], hashes[5])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from QFA import GQFA
 import numpy as np
+import scipy.sparse as sp
 from math import sqrt
 
 
@@ -42,6 +43,48 @@ class GQFATest(unittest.TestCase):
         prob_aa, err_aa = gqfa.process('aa')
         self.assertAlmostEqual(prob_aa, (5/8 + 1/(2*sqrt(2))), delta=err_aa)
 
+    def test_process_many(self):
+        qfa = GQFA.example()
+        words = ['', 'a', 'aa', 'aaa', 'aaaaaaa', 'aaaa']
+
+        probabilities, errors = qfa.process_many(words)
+
+        self.assertEqual(probabilities.shape, (len(words),))
+        for word, p, e in zip(words, probabilities, errors):
+            p_word, e_word = qfa.process(word)
+            self.assertAlmostEqual(p, p_word, places=15)
+            self.assertAlmostEqual(e, e_word, places=15)
+
+    def test_sparse(self):
+        dense = GQFA.example()
+        sparse = GQFA.GQFA(dense.alphabet, dense.initial_state, dense.transition_matrices,
+                           [measurements[:2] for measurements in dense.projective_measurements], backend='sparse')
+        words = ['', 'a', 'aa', 'aaa', 'aaaaaaa']
+
+        self.assertEqual(sparse.compile().backend, 'sparse')
+        probabilities, errors = sparse.process_many(words)
+        for word, p, e in zip(words, probabilities, errors):
+            p_dense, e_dense = dense.process(word)
+            self.assertAlmostEqual(sparse.process(word)[0], p_dense, places=15)
+            self.assertAlmostEqual(p, p_dense, places=15)
+            self.assertAlmostEqual(e, e_dense, places=15)
+
+    def test_large_sparse(self):
+        # a cyclic shift over 2000 states, accepting after every 2000th letter
+        size = 2000
+        shift = sp.csr_matrix((np.ones(size), (np.roll(np.arange(size), -1), np.arange(size))), shape=(size, size))
+        initial_state = sp.csr_matrix(([1], ([0], [0])), shape=(size, 1))
+        measurement_acc = sp.csr_matrix(([1], ([0], [0])), shape=(size, size))
+        measurement_rej = sp.csr_matrix(([1], ([1], [1])), shape=(size, size))
+        end_matrix = sp.identity(size, format='csr')
+
+        gqfa = GQFA.GQFA('a', initial_state, [shift, end_matrix],
+                         [[sp.csr_matrix((size, size)), sp.csr_matrix((size, size))], [measurement_acc, measurement_rej]])
+
+        probabilities, errors = gqfa.process_many(['a' * size, 'a', 'a' * (size + 1)])
+        np.testing.assert_allclose(probabilities, [1, 0, 0])
+        np.testing.assert_allclose(errors, [0, 0, 0])
+
 
 if __name__ == '__main__':
     unittest.main()
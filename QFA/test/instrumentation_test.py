@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from QFA import LanguageChecker as Checker, MM_1QFA as MM, MO_1QFA as MO, PFA
+from QFA.Instrumentation import Collector
+from QFA.LanguageGenerator import LanguageGenerator
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def test_process(self):
+        automaton = PFA.pfa_example()
+        collector = Collector()
+        self.assertEqual(automaton.process('abba', collector=collector), automaton.process('abba'))
+        automaton.process('aaaa', rle=True, collector=collector)
+
+        report = collector.report()['PFA']
+        self.assertEqual(report['words'], 2)
+        self.assertEqual(report['letters'], 8)
+        # 4 letters, 1 run of 'a' and 2 final products
+        self.assertEqual(report['matrix_products'], 4 + 1 + 2)
+        self.assertEqual(set(report['phases']), {'encode', 'transitions', 'measurement'})
+        self.assertEqual(report['phases']['transitions']['calls'], 2)
+
+    def test_process_many(self):
+        automaton = MM.example()
+        words = ['', 'a', 'aa', 'aaa', 'aaaa']
+        collector = Collector()
+        p, e = automaton.process_many(words, collector=collector)
+        expected_p, expected_e = automaton.process_many(words)
+        np.testing.assert_array_equal(p, expected_p)
+
+        report = collector.report()['MM_1QFA']
+        self.assertEqual(report['words'], 5)
+        self.assertEqual(report['letters'], 10)
+        # every word reads the end symbol as well
+        self.assertEqual(report['matrix_vector_products'], 10 + 5)
+        # one product per position: 'a' at positions 0 to 3 (and the end symbol), the end symbol at 4
+        self.assertEqual(report['matrix_products'], 1 + 2 + 2 + 2 + 2)
+
+        collector.reset()
+        p, e = automaton.process_trie(words + ['aa'], collector=collector)
+        np.testing.assert_allclose(p, np.append(expected_p, expected_p[2]), atol=1e-12)
+        report = collector.report()['MM_1QFA']
+        self.assertEqual(report['words'], 6)
+        # only the letters of distinct prefixes are read
+        self.assertEqual(report['letters'], 4)
+
+    def test_checker(self):
+        automaton = MO.mo_1qfa_example_4()
+        language, not_in_language = LanguageGenerator('(aaa)*', 'a').get_language_sample(100)
+        collector = Collector()
+        checker = Checker.LanguageChecker(automaton, language, not_in_language, collector=collector)
+        accepted = checker.check_language()
+        self.assertEqual(accepted, Checker.LanguageChecker(automaton, language, not_in_language).check_language())
+
+        report = collector.report()['MO_1QFA']
+        self.assertEqual(report['words'], 100)
+        self.assertEqual(report['letters'], sum(map(len, language + not_in_language)))
+        self.assertEqual(set(report['phases']), {'encode', 'transitions', 'measurement', 'evaluate', 'criteria'})
+        self.assertEqual(report['phases']['criteria']['calls'], 3)
+        self.assertGreaterEqual(report['phases']['evaluate']['seconds'],
+                                report['phases']['transitions']['seconds'])
+
+    def test_generator(self):
+        collector = Collector()
+        generator = LanguageGenerator('[ab]*b', 'ab', collector=collector)
+        generator.get_random_sample(20, max_len=10, seed=0, batch_size=8)
+        generator.get_uniform_sample(20, max_len=10)
+        generator.get_language_sample(20)
+
+        report = collector.report()['LanguageGenerator']
+        self.assertEqual(report['words'], 60)
+        # one record for every batch of get_random_sample
+        self.assertGreaterEqual(report['phases']['generation']['calls'], 2 + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import itertools
+import unittest
+from QFA import MM_1QFA as MM, MO_1QFA as MO, PFA
+from QFA.Kernel import MEASURE_MANY, SINGLE
+from QFA.Cache import LRUCache, PrefixCache
+from QFA.LanguageGenerator import LanguageGenerator
+import numpy as np
+
+
+class KernelTest(unittest.TestCase):
+
+    def test_compile(self):
+        qfa = MM.example()
+        kernel = qfa.compile()
+
+        self.assertIs(qfa.compile(), kernel)
+        self.assertEqual(kernel.kind, MEASURE_MANY)
+        # the transition of every symbol fused with the measurement: 3 * 4 rows, 4 columns
+        self.assertEqual(kernel.operators.shape, (2, 12, 4))
+        self.assertTrue(kernel.operators.flags.c_contiguous)
+        self.assertEqual(kernel.end_symbol, 1)
+
+        with self.assertRaises(AttributeError):
+            kernel.end_symbol = 0
+        with self.assertRaises(ValueError):
+            kernel.operators[0, 0, 0] = 1
+
+    def test_flat_initial_state(self):
+        # a 1-D initial state gives the same results as a column
+        mo = MO.mo_1qfa_example_4()
+        flat_mo = MO.MO_1QFA(mo.alphabet, mo.initial_state.ravel(), mo.transition_matrices,
+                             mo.projective_measurement)
+        mm = MM.example()
+        flat_mm = MM.MM_1QFA(mm.alphabet, mm.initial_state.ravel(), mm.transition_matrices,
+                             mm.projective_measurement_accept, mm.projective_measurement_reject,
+                             mm.projective_measurement_non)
+        words = ['', 'a', 'aa', 'aaa', 'aaaaa']
+        for automaton, flat in [(mo, flat_mo), (mm, flat_mm)]:
+            self.assertEqual(flat.compile().size, automaton.compile().size)
+            np.testing.assert_allclose(flat.process_many(words), automaton.process_many(words))
+            self.assertEqual(flat.process('aaa'), automaton.process('aaa'))
+
+    def test_encode(self):
+        kernel = PFA.pfa_example().compile()
+
+        np.testing.assert_array_equal(kernel.encode('abba'), [0, 1, 1, 0])
+        codes, offsets = kernel.encode_many(['ab', '', 'bbb'])
+        np.testing.assert_array_equal(codes, [0, 1, 1, 1, 1])
+        np.testing.assert_array_equal(offsets, [0, 2, 2, 5])
+
+        with self.assertRaises(ValueError):
+            kernel.encode('abc')
+        with self.assertRaises(ValueError):
+            kernel.encode('aą')
+
+    def test_recompile(self):
+        pfa = PFA.dfa_example()
+        kernel = pfa.compile()
+        p_aa, e_aa = pfa.process('aa')
+        self.assertAlmostEqual(p_aa, 1, delta=e_aa)
+
+        pfa.acceptance_vector = np.array([[1], [0], [0]])
+
+        self.assertIsNot(pfa.compile(), kernel)
+        p_aa, e_aa = pfa.process('aa')
+        self.assertAlmostEqual(p_aa, 0, delta=e_aa)
+
+    def test_power_cache(self):
+        kernel = PFA.pfa_example().compile()
+        a_matrix = kernel.operators[0]
+
+        np.testing.assert_allclose(kernel.power(0, 13), np.linalg.matrix_power(a_matrix, 13))
+        self.assertIn(13, kernel.powers[0])
+        self.assertIn(6, kernel.powers[0])
+        self.assertNotIn(13, kernel.powers[1])
+
+        hits = kernel.powers[0].hits
+        kernel.power(0, 13)
+        self.assertEqual(kernel.powers[0].hits, hits + 1)
+
+    def test_run_many_blocks(self):
+        for automaton in [PFA.pfa_example(), MO.mo_1qfa_example_4(), MM.example()]:
+            kernel = automaton.compile()
+            words = [''.join(w) for length in range(6) for w in itertools.product(automaton.alphabet, repeat=length)]
+            codes, offsets = kernel.encode_many(words)
+            expected_p, expected_e = kernel.run_many(codes, offsets)
+            # blocks smaller than the number of words and of words of different lengths
+            p, e = kernel.run_many(codes, offsets, block_size=5)
+            np.testing.assert_allclose(p, expected_p)
+            np.testing.assert_allclose(e, expected_e, atol=1e-12)
+            np.testing.assert_allclose(p, [automaton.process(word)[0] for word in words])
+
+    def test_run_all(self):
+        automaton = MM.example()
+        kernel = automaton.compile()
+        dfa = LanguageGenerator('(aa)*', 'a').get_dfa()
+
+        words = [w for length in range(2, 6) for w in map(''.join, itertools.product(kernel.alphabet, repeat=length))]
+        expected_p, expected_e = automaton.process_many(words)
+        results = {}
+        for length, first, p, e, labels in kernel.run_all(5, 2, dfa, block_size=3):
+            self.assertLessEqual(len(p), 3)
+            for i in range(len(p)):
+                word = kernel.word_at(length, first + i)
+                self.assertEqual(len(word), length)
+                self.assertEqual(labels[i], length % 2 == 0)
+                results[word] = (p[i], e[i])
+
+        self.assertEqual(sorted(results), sorted(words))
+        np.testing.assert_allclose([results[w][0] for w in words], expected_p, atol=1e-12)
+        np.testing.assert_allclose([results[w][1] for w in words], expected_e, atol=1e-12)
+
+        kernel = PFA.pfa_example().compile()
+        self.assertEqual([kernel.word_at(2, rank) for rank in range(4)], ['aa', 'ab', 'ba', 'bb'])
+
+    def test_precision(self):
+        # real matrices given as complex arrays are evaluated with real numbers
+        qfa = MO.mo_1qfa_example_4()
+        qfa.transition_matrices = [m.astype(complex) for m in qfa.transition_matrices]
+        self.assertEqual(qfa.compile().dtype, np.float64)
+        self.assertEqual(qfa.compile().operators.dtype, np.float64)
+
+        words = ['', 'a', 'aaa', 'a' * 50]
+        for automaton in [qfa, MM.example(), PFA.pfa_example()]:
+            expected_p, _ = automaton.process_many(words)
+            automaton.precision = SINGLE
+            kernel = automaton.compile()
+            self.assertEqual(kernel.operators.dtype, np.float32)
+
+            p, e = automaton.process_many(words)
+            np.testing.assert_array_less(np.abs(p - expected_p), e)
+            np.testing.assert_array_less(0, e)
+            # the bounds grow with the length of the words
+            self.assertTrue(np.all(np.diff(e) > 0))
+            p_word, e_word = automaton.process(words[-1])
+            self.assertAlmostEqual(p_word, p[-1], places=5)
+            self.assertAlmostEqual(e_word, e[-1])
+
+        with self.assertRaises(Exception):
+            MO.MO_1QFA('a', np.array([[1], [0]]), [np.eye(2)], np.eye(2), precision='half').compile()
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('b', 0), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_prefix_cache(self):
+        pfa = PFA.pfa_example()
+        expected = {word: pfa.process(word) for word in ['abab', 'ababb', 'abba', 'b']}
+        self.assertIsNone(pfa.cache_info())
+
+        pfa.enable_prefix_cache(maxsize=3, stride=2)
+        self.assertEqual(pfa.process('abab'), expected['abab'])
+        # 'ab' and 'abab' are cached
+        self.assertEqual(pfa.cache_info(), {'hits': 0, 'misses': 1, 'maxsize': 3, 'currsize': 2})
+        self.assertEqual(pfa.process('ababb'), expected['ababb'])
+        # resumed from 'ab'
+        self.assertEqual(pfa.process('abba'), expected['abba'])
+        self.assertEqual(pfa.process('b'), expected['b'])
+        info = pfa.cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['currsize']), (2, 2, 3))
+
+        # the cache is cleared when the automaton changes
+        pfa.acceptance_vector = np.array([[1], [0], [0]])
+        self.assertEqual(pfa.cache_info()['currsize'], 0)
+        self.assertEqual(pfa.process('b'), (1, 0))
+        pfa.transition_matrices[1][0] = [0, 1, 0]
+        pfa.invalidate()
+        self.assertEqual(pfa.process('b'), (0, 0))
+
+        # the accumulated probabilities of measure-many automata are resumed as well
+        qfa = MM.example()
+        expected = qfa.process('aaaaa')
+        qfa.enable_prefix_cache()
+        qfa.process('aaaa')
+        p, e = qfa.process('aaaaa')
+        self.assertEqual(qfa.cache_info()['hits'], 1)
+        self.assertAlmostEqual(p, expected[0])
+        self.assertAlmostEqual(e, expected[1])
+
+        cache = PrefixCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('ab', 2)
+        cache.put('abc', 3)
+        self.assertEqual(cache.longest_prefix('abcd'), (3, 3))
+        self.assertEqual(cache.longest_prefix('az'), (0, None))
+        self.assertEqual(set(cache.lengths), {2, 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
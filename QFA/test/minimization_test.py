@@ -0,0 +1,68 @@
+import itertools
+import unittest
+import numpy as np
+from scipy.linalg import block_diag
+from QFA import MM_1QFA as MM, MO_1QFA as MO, PFA
+from QFA.Equivalence import equivalent
+from QFA.Minimization import minimize
+
+
+def all_words(alphabet, max_len):
+    return [''.join(w) for length in range(max_len + 1) for w in itertools.product(alphabet, repeat=length)]
+
+
+class MinimizationTest(unittest.TestCase):
+
+    def assertSameProbabilities(self, automaton, minimized, max_len=6):
+        words = all_words(automaton.alphabet, max_len)
+        np.testing.assert_allclose(minimized.process_many(words)[0], automaton.process_many(words)[0], atol=1e-9)
+
+    def test_pfa(self):
+        dfa = PFA.dfa_example()
+        # two copies of the states, the copy is reached with probability 1/2 and behaves the same,
+        # and two unreachable states
+        a_matrix, b_matrix = dfa.transition_matrices
+        transition_matrices = [block_diag(m, m, np.eye(2)) for m in (a_matrix, b_matrix)]
+        initial_state = np.array([[0.5, 0, 0, 0.5, 0, 0, 0, 0]])
+        acceptance_vector = np.array([[0], [0], [1], [0], [0], [1], [1], [1]])
+        pfa = PFA.PFA('ab', initial_state, transition_matrices, acceptance_vector)
+
+        minimized = minimize(pfa)
+        self.assertIsInstance(minimized, PFA.PFA)
+        self.assertEqual(minimized.initial_state.shape, (1, 3))
+        self.assertEqual(len(minimized.transition_matrices), 2)
+        self.assertSameProbabilities(pfa, minimized)
+        self.assertTrue(equivalent(pfa, minimized))
+
+        # the probability of acceptance after 'a' is the same as after 'b'
+        minimized = minimize(PFA.pfa_example())
+        self.assertEqual(minimized.initial_state.shape, (1, 2))
+        self.assertSameProbabilities(PFA.pfa_example(), minimized)
+
+    def test_mo_1qfa(self):
+        qfa = MO.mo_1qfa_example_4()
+        a_matrix, end_matrix = qfa.transition_matrices
+        rotation = np.array([[0, -1], [1, 0]])
+        # a reachable block which is never measured, and an unreachable block
+        transition_matrices = [block_diag(a_matrix, rotation, rotation), block_diag(end_matrix, np.eye(2), np.eye(2))]
+        projection = block_diag(qfa.projective_measurement, np.zeros((2, 2)), np.eye(2))
+        initial_state = np.array([[1], [0], [1], [0], [0], [0]]) / np.sqrt(2)
+        mo_1qfa = MO.MO_1QFA('a', initial_state, transition_matrices, projection)
+
+        minimized = minimize(mo_1qfa)
+        self.assertIsInstance(minimized, MO.MO_1QFA)
+        self.assertEqual(minimized.initial_state.shape, (2, 1))
+        # the restrictions are still unitary and a projection
+        for m in minimized.transition_matrices:
+            np.testing.assert_allclose(m.conj().T @ m, np.eye(2), atol=1e-12)
+        p = minimized.projective_measurement
+        np.testing.assert_allclose(p @ p, p, atol=1e-12)
+        self.assertSameProbabilities(mo_1qfa, minimized)
+
+    def test_measure_many(self):
+        with self.assertRaises(Exception):
+            minimize(MM.example())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -45,6 +45,39 @@ class MM1QFATest(unittest.TestCase):
         prob_aa, err_aa = qfa.process('aa')
         self.assertAlmostEqual(prob_aa, (5/8 + 1/(2*(sqrt(2)))), delta=err_aa)
 
+    def test_process_many(self):
+        qfa = MM.example()
+        words = ['', 'a', 'aa', 'aaa', 'aaaaaaa', 'aaaa']
+
+        probabilities, errors = qfa.process_many(words)
+
+        self.assertEqual(probabilities.shape, (len(words),))
+        for word, p, e in zip(words, probabilities, errors):
+            p_word, e_word = qfa.process(word)
+            self.assertAlmostEqual(p, p_word, places=15)
+            self.assertAlmostEqual(e, e_word, places=15)
+
+    def test_sparse(self):
+        dense = MM.example()
+        sparse = MM.MM_1QFA(dense.alphabet, dense.initial_state, dense.transition_matrices,
+                            dense.projective_measurement_accept, dense.projective_measurement_reject,
+                            backend='sparse')
+        words = ['', 'a', 'aa', 'aaa', 'aaaaaaa']
+
+        self.assertEqual(sparse.compile().backend, 'sparse')
+        probabilities, errors = sparse.process_many(words)
+        for word, p, e in zip(words, probabilities, errors):
+            p_dense, e_dense = dense.process(word)
+            self.assertAlmostEqual(sparse.process(word)[0], p_dense, places=15)
+            self.assertAlmostEqual(p, p_dense, places=15)
+            self.assertAlmostEqual(e, e_dense, places=15)
+
+    def test_sparse_not_unitary(self):
+        qfa = MM.example()
+        with self.assertRaises(Exception):
+            MM.MM_1QFA(qfa.alphabet, qfa.initial_state, [qfa.transition_matrices[0] * 2, qfa.transition_matrices[1]],
+                       qfa.projective_measurement_accept, qfa.projective_measurement_reject, backend='sparse')
+
 
 if __name__ == '__main__':
     unittest.main()
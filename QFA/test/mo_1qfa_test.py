@@ -109,6 +109,43 @@ class MO1QFATest(unittest.TestCase):
         self.assertAlmostEqual(p_aa, 1/4, delta=max(error, e_aa))
         self.assertAlmostEqual(p_aaa, 1, delta=max(error, e_aaa))
 
+    def test_process_many(self):
+        qfa = MO.mo_1qfa_example_3()
+        words = ['', '0', '1', '111', '101', '001', '0110', '10']
+
+        probabilities, errors = qfa.process_many(words)
+
+        self.assertEqual(probabilities.shape, (len(words),))
+        for word, p, e in zip(words, probabilities, errors):
+            p_word, e_word = qfa.process(word)
+            self.assertAlmostEqual(p, p_word.real, places=15)
+            self.assertEqual(e, e_word)
+
+    def test_rle(self):
+        qfa = MO.mo_1qfa_example_4()
+        words = ['', 'a', 'a' * 999, 'a' * 1000, 'a' * 4097]
+
+        for word in words:
+            p, e = qfa.process(word)
+            p_rle, e_rle = qfa.process(word, rle=True)
+            self.assertAlmostEqual(p, p_rle, places=12)
+            self.assertEqual(e, e_rle)
+
+        self.assertAlmostEqual(qfa.process('a' * 999, rle=True)[0], 1, places=12)
+
+    def test_sparse(self):
+        dense = MO.mo_1qfa_example_3()
+        sparse = MO.MO_1QFA(dense.alphabet, dense.initial_state, dense.transition_matrices,
+                            dense.projective_measurement, backend='sparse')
+        words = ['', '0', '1', '111', '101', '001', '0110', '10']
+
+        self.assertEqual(sparse.compile().backend, 'sparse')
+        probabilities, errors = sparse.process_many(words)
+        for word, p, e in zip(words, probabilities, errors):
+            p_dense, e_dense = dense.process(word)
+            self.assertAlmostEqual(sparse.process(word)[0], p_dense, places=15)
+            self.assertAlmostEqual(p, p_dense, places=15)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import numpy as np
+from scipy.linalg import block_diag
+from scipy.stats import unitary_group
+from QFA.Kernel import Kernel
+from QFA.MO_1QFA import MO_1QFA
+from QFA.Operators import BlockDiagonalOperator, DiagonalOperator, GatherOperator, structured
+
+
+def rotation(angle):
+    return np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+
+
+class OperatorsTest(unittest.TestCase):
+
+    def assertSameProducts(self, operator, matrix):
+        rng = np.random.default_rng(0)
+        vector = rng.normal(size=matrix.shape[1]) + 1j * rng.normal(size=matrix.shape[1])
+        columns = rng.normal(size=(matrix.shape[1], 5))
+        np.testing.assert_allclose(operator.toarray(), matrix)
+        np.testing.assert_allclose(operator @ vector, matrix @ vector)
+        np.testing.assert_allclose(operator @ columns, matrix @ columns)
+
+    def test_permutation(self):
+        matrix = np.eye(32)[np.random.default_rng(1).permutation(32)]
+        operator = structured(matrix)
+        self.assertIsInstance(operator, GatherOperator)
+        self.assertIsNone(operator.values)
+        self.assertSameProducts(operator, matrix)
+
+    def test_diagonal(self):
+        matrix = np.diag(np.exp(2j * np.pi * np.arange(32) / 32))
+        operator = structured(matrix)
+        self.assertIsInstance(operator, DiagonalOperator)
+        self.assertSameProducts(operator, matrix)
+
+    def test_measured_permutation(self):
+        # a permutation fused with projections, as in measure-many kernels: rows of zeros and a rectangular shape
+        permutation = np.eye(32)[np.random.default_rng(2).permutation(32)]
+        projection = np.diag(np.arange(32) % 3 == 0).astype(float)
+        matrix = np.vstack([projection @ permutation, (np.eye(32) - projection) @ permutation])
+        operator = structured(matrix)
+        self.assertIsInstance(operator, GatherOperator)
+        self.assertSameProducts(operator, matrix)
+
+    def test_block_diagonal(self):
+        blocks = [rotation(angle) for angle in np.linspace(0.1, 1.5, 12)] + [unitary_group.rvs(3, random_state=3)] * 2
+        matrix = block_diag(*blocks, rotation(0.3), rotation(0.7))
+        operator = structured(matrix)
+        self.assertIsInstance(operator, BlockDiagonalOperator)
+        # runs of 12 rotations, 2 blocks 3 x 3 and 2 rotations
+        self.assertEqual([blocks.shape for _, blocks in operator.groups], [(12, 2, 2), (2, 3, 3), (2, 2, 2)])
+        self.assertSameProducts(operator, matrix)
+
+    def test_dense(self):
+        matrix = unitary_group.rvs(32, random_state=4)
+        self.assertIs(structured(matrix), matrix)
+        # blocks with more than a quarter of the entries, and small matrices
+        two_blocks = block_diag(rotation(0.2), matrix[:30, :30])
+        self.assertIs(structured(two_blocks), two_blocks)
+        small = np.eye(8)[::-1]
+        self.assertIs(structured(small), small)
+
+    def test_kernel(self):
+        n = 32
+        rng = np.random.default_rng(5)
+        a_matrix = np.eye(n)[rng.permutation(n)]
+        b_matrix = np.diag(np.exp(1j * rng.uniform(0, 2 * np.pi, n)))
+        c_matrix = block_diag(*[rotation(angle) for angle in rng.uniform(0, 2 * np.pi, n // 2)])
+        hadamard = np.ones((n, 1)) / np.sqrt(n)
+        measurement = np.diag(np.arange(n) < n // 2).astype(float)
+        mo_1qfa = MO_1QFA('abc', hadamard, [a_matrix, b_matrix, c_matrix], measurement)
+
+        kernel = mo_1qfa.compile()
+        self.assertIsInstance(kernel.structured[0], GatherOperator)
+        self.assertIsInstance(kernel.structured[1], DiagonalOperator)
+        self.assertIsInstance(kernel.structured[2], BlockDiagonalOperator)
+        # the operators stay dense matrices
+        np.testing.assert_allclose(kernel.operators[2], c_matrix)
+
+        words = [''.join(rng.choice(list('abc'), length)) for length in range(12)]
+        matrices = {'a': a_matrix, 'b': b_matrix, 'c': c_matrix}
+        expected = []
+        for word in words:
+            state = hadamard[:, 0]
+            for letter in word:
+                state = matrices[letter] @ state
+            expected.append(np.linalg.norm(measurement @ state) ** 2)
+        np.testing.assert_allclose(mo_1qfa.process_many(words)[0], expected)
+        np.testing.assert_allclose([mo_1qfa.process(word)[0] for word in words], expected)
+
+        restored = Kernel.restore(kernel.fields())
+        self.assertEqual([type(operator) for operator in restored.structured],
+                         [type(operator) for operator in kernel.structured])
+
+
+if __name__ == '__main__':
+    unittest.main()
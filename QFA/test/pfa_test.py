@@ -39,6 +39,42 @@ class PFATest(unittest.TestCase):
         self.assertAlmostEqual(p_aa, 0.5, delta=e_aa)
         self.assertAlmostEqual(p_ab, 0.5, delta=e_ab)
 
+    def test_process_many(self):
+        pfa = PFA.pfa_example()
+        words = ['', 'a', 'b', 'aa', 'ab', 'ba', 'bbab', 'aabba']
+
+        probabilities, errors = pfa.process_many(words)
+
+        self.assertEqual(probabilities.shape, (len(words),))
+        for word, p, e in zip(words, probabilities, errors):
+            p_word, e_word = pfa.process(word)
+            self.assertAlmostEqual(p, p_word, places=15)
+            self.assertEqual(e, e_word)
+
+    def test_rle(self):
+        pfa = PFA.pfa_example()
+        words = ['', 'a', 'ab', 'a' * 1000 + 'b' * 1000, 'abbbbbbbbaaab' * 3, 'b' * 37]
+
+        for word in words:
+            p, e = pfa.process(word)
+            p_rle, e_rle = pfa.process(word, rle=True)
+            self.assertAlmostEqual(p, p_rle, places=12)
+            self.assertEqual(e, e_rle)
+
+    def test_sparse(self):
+        dense = PFA.pfa_example()
+        sparse = PFA.PFA(dense.alphabet, dense.initial_state, dense.transition_matrices, dense.acceptance_vector,
+                         backend='sparse')
+        words = ['', 'a', 'ab', 'ba', 'aab', 'bbbaaa', 'a' * 50]
+
+        self.assertEqual(sparse.compile().backend, 'sparse')
+        probabilities, errors = sparse.process_many(words)
+        for word, p, e in zip(words, probabilities, errors):
+            p_dense, e_dense = dense.process(word)
+            self.assertAlmostEqual(sparse.process(word)[0], p_dense, places=15)
+            self.assertAlmostEqual(sparse.process(word, rle=True)[0], p_dense, places=12)
+            self.assertAlmostEqual(p, p_dense, places=15)
+
 
 if __name__ == '__main__':
     unittest.main()
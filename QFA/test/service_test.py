@@ -0,0 +1,99 @@
+import asyncio
+import json
+import unittest
+import numpy as np
+from QFA import MO_1QFA as MO, PFA
+from QFA.Service import EvaluationService
+
+
+async def request(reader, writer, message):
+    writer.write(json.dumps(message).encode('utf-8') + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+class ServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.automata = {'mo': MO.mo_1qfa_example_4(), 'pfa': PFA.pfa_example()}
+
+    def test_concurrent_requests(self):
+        words = [['a' * i for i in range(k, k + 5)] for k in range(50)]
+
+        async def client(address, i):
+            reader, writer = await asyncio.open_connection(*address)
+            response = await request(reader, writer, {'id': i, 'automaton': 'mo', 'words': words[i]})
+            writer.close()
+            return response
+
+        async def run():
+            service = EvaluationService(self.automata, max_latency=0.05)
+            address = await service.start()
+            try:
+                responses = await asyncio.gather(*[client(address, i) for i in range(len(words))])
+            finally:
+                await service.close()
+            return service, responses
+
+        service, responses = asyncio.run(run())
+        for i, response in enumerate(responses):
+            self.assertEqual(response['id'], i)
+            p, e = self.automata['mo'].process_many(words[i])
+            np.testing.assert_allclose(response['probabilities'], p)
+            np.testing.assert_allclose(response['errors'], e)
+        self.assertEqual(service.stats['requests'], 50)
+        self.assertEqual(service.stats['words'], 250)
+        # the requests are coalesced into a few batches
+        self.assertLess(service.stats['batches'], 50)
+
+    def test_pipelined_requests(self):
+        async def run():
+            service = EvaluationService(self.automata, max_batch_size=4)
+            address = await service.start()
+            try:
+                reader, writer = await asyncio.open_connection(*address)
+                for i in range(10):
+                    automaton = 'mo' if i % 2 else 'pfa'
+                    message = {'id': i, 'automaton': automaton, 'words': ['a', 'aa', 'aaa']}
+                    writer.write(json.dumps(message).encode('utf-8') + b'\n')
+                await writer.drain()
+                responses = [json.loads(await reader.readline()) for _ in range(10)]
+                writer.close()
+            finally:
+                await service.close()
+            return responses
+
+        responses = sorted(asyncio.run(run()), key=lambda response: response['id'])
+        self.assertEqual([response['id'] for response in responses], list(range(10)))
+        self.assertAlmostEqual(responses[1]['probabilities'][2], self.automata['mo'].process('aaa')[0])
+        self.assertAlmostEqual(responses[0]['probabilities'][1], self.automata['pfa'].process('aa')[0])
+
+    def test_errors(self):
+        async def run():
+            service = EvaluationService(self.automata)
+            address = await service.start()
+            try:
+                reader, writer = await asyncio.open_connection(*address)
+                responses = [await request(reader, writer, {'id': 1, 'automaton': 'gqfa', 'words': ['a']}),
+                             await request(reader, writer, {'id': 2, 'automaton': 'mo', 'words': ['ab']}),
+                             await request(reader, writer, {'id': 3, 'automaton': 'mo', 'words': 'a'})]
+                writer.write(b'not json\n')
+                responses.append(json.loads(await reader.readline()))
+                # the connection is still usable
+                responses.append(await request(reader, writer, {'automaton': 'mo', 'words': []}))
+                writer.close()
+            finally:
+                await service.close()
+            return responses
+
+        responses = asyncio.run(run())
+        self.assertEqual(responses[0], {'id': 1, 'error': 'Unknown automaton: gqfa'})
+        self.assertEqual(responses[1]['id'], 2)
+        self.assertIn('alphabet', responses[1]['error'])
+        self.assertIn('error', responses[2])
+        self.assertIn('error', responses[3])
+        self.assertEqual(responses[4], {'probabilities': [], 'errors': []})
+
+
+if __name__ == '__main__':
+    unittest.main()